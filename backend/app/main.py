@@ -1,5 +1,6 @@
 
 
+from contextlib import asynccontextmanager
 # Import the main FastAPI class
 from fastapi import FastAPI 
 # Import the routers for different parts of your application
@@ -12,8 +13,24 @@ from app.routes import viewer
 from app.routes import insights
 from app.routes import reports
 from app.routes import analytics
+from app.routes import system
+from app.routes import talent_pool
+from app.services.model_loader_service import WARM_ON_STARTUP, warm_all_in_background
+from app.services.metrics_service import METRICS_ENABLED, ServerTimingMiddleware, start_snapshot_writer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Models load lazily; warming them in background threads lets the API
+    # accept requests immediately while /ready reports progress.
+    if WARM_ON_STARTUP:
+        warm_all_in_background()
+    # With several workers, each one shares its metrics for /metrics to sum
+    start_snapshot_writer(system.process_metrics)
+    yield
+
 # Create a FastAPI application instance with a descriptive title for the docs
-app = FastAPI(title="HireSense AI Resume Shortlister")
+app = FastAPI(title="HireSense AI Resume Shortlister", lifespan=lifespan)
 
 # Add the CORS middleware here
 origins = [
@@ -29,6 +46,9 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+if METRICS_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+
 # Define a root endpoint to confirm the API is running
 @app.get("/")
 def read_root():
@@ -55,4 +75,8 @@ app.include_router(insights.router, tags=["Insights"])
 
 app.include_router(reports.router,tags=["Reports"])
 
-app.include_router(analytics.router, tags=["Analytics & Dashboard"])
\ No newline at end of file
+app.include_router(analytics.router, tags=["Analytics & Dashboard"])
+
+app.include_router(talent_pool.router, tags=["Talent Pool"])
+
+app.include_router(system.router, tags=["System"])
\ No newline at end of file
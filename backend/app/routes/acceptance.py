@@ -1,19 +1,19 @@
 # app/routes/acceptance.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from app.services.acceptance_service import move_accepted_resume
-from .matcher import db
+from app.services.session_service import Session, get_session
 
 router = APIRouter()
 
 @router.post("/accept-resume/{filename}")
-async def accept_resume(filename: str):
+async def accept_resume(filename: str, session: Session = Depends(get_session)):
     """
     Handles the API request to accept a resume and calls the service
     to perform the file move.
     """
     try:
-        move_accepted_resume(db, filename)
+        move_accepted_resume(session, filename)
         return {"message": f"Resume '{filename}' has been accepted and moved."}
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Resume not found.")
@@ -1,97 +1,64 @@
-import math
-from fastapi import APIRouter, HTTPException
-from app.routes.matcher import db 
-from collections import Counter
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.services.session_service import Session, get_session
 
 router = APIRouter()
 
-def get_analytics_data():
+def get_analytics_data(session: Session, bin_width: int = 20, top_n: int = 8):
     """
-    Calculates key analytics metrics from the ranked resume data:
+    Reads key analytics metrics from the running aggregates that the session's
+    resume collection updates whenever scores are written or candidates are
+    accepted/rejected:
     - Fit Score Distribution (Histogram)
     - Top Skills Summary (across all resumes)
     - Overall Skill Gap (matched vs missing aggregated)
     """
     # Check 1: Data is uploaded
-    if not db.get("jd") or not db.get("resumes") or not db["resumes"]:
+    if not session.jd or not session.resumes:
         # Using 404 since the resource (calculated analytics) is not yet available/found.
         raise HTTPException(status_code=404, detail="Please upload a JD and at least one resume.")
 
-    # Check 2: Matching has been run (scores are present)
-    # The score should be added by the /match/ endpoint.
-    if not any("score" in r for r in db["resumes"]):
-        # Using 400 Bad Request because the request (to view analytics) is invalid
-        # without the required prerequisite data (the scores).
-        raise HTTPException(status_code=400, detail="Run the /match/ endpoint before checking analytics. Data is present, but scores are missing.")
+    # Read under the collection's lock: a running match job may be updating the aggregates
+    with session.resumes.lock:
+        aggregates = session.resumes.analytics
 
-    # --- 1. Fit Score Distribution (Histogram) ---
-    # Scores are assumed to be 0-100
-    scores = [r.get("score", 0) for r in db["resumes"]]
-    
-    # Define bins: 0-20, 20-40, 40-60, 60-80, 80-100
-    # Note: We use 5 bins covering 0% to 100%
-    bins = [0, 20, 40, 60, 80, 100]
-    histogram_counts = [0] * (len(bins) - 1)
-    
-    for score in scores:
-        # Normalize score to 0-100 range if needed, though assumed already in this range
-        score = max(0, min(100, score))
-        
-        # Calculate which bin the score falls into
-        if score == 100:
-            # 100 goes into the last bin [80, 100]
-            histogram_counts[len(bins) - 2] += 1
-        else:
-            # Calculate bin index (e.g., score 59.9 -> 2, score 60 -> 3)
-            bin_size = 20
-            index = math.floor(score / bin_size)
-            if index < len(bins) - 1:
-                histogram_counts[index] += 1
-    
-    histogram_data = [
-        {"range": f"{bins[i]}-{bins[i+1]}%", "count": histogram_counts[i]}
-        for i in range(len(bins) - 1)
-    ]
-    
-    # --- 2. Top Skills Summary (across all resumes) & Overall Skill Gap ---
-    all_resume_skills = []
-    total_matched = 0
-    total_missing = 0
+        # Check 2: Matching has been run (scores are present)
+        # The score should be added by the /match/ endpoint.
+        if not aggregates.scored:
+            # Using 400 Bad Request because the request (to view analytics) is invalid
+            # without the required prerequisite data (the scores).
+            raise HTTPException(status_code=400, detail="Run the /match/ endpoint before checking analytics. Data is present, but scores are missing.")
 
-    for resume in db["resumes"]:
-        # The skills were populated in the /match/ endpoint
-        matched_skills = resume.get("matched_skills", [])
-        missing_skills = resume.get("missing_skills", [])
-        
-        # We only count matched skills for the "Top Skills" chart
-        all_resume_skills.extend(matched_skills) 
-        
-        total_matched += len(matched_skills)
-        total_missing += len(missing_skills)
-        
-    skill_counts = Counter(all_resume_skills)
-    
-    # Get top 8 skills for the chart
-    top_skills = skill_counts.most_common(8)
+        # --- 1. Fit Score Distribution (Histogram) ---
+        # Scores are 0-100; a score of 100 goes into the last bin
+        histogram_data = aggregates.histogram(bin_width)
 
-    # --- 3. Overall Skill Gap (Aggregated) ---
-    overall_skill_gap = {
-        "matched": total_matched,
-        "missing": total_missing
-    }
+        # --- 2. Top Skills Summary (across all resumes) ---
+        # Only matched skills are counted for the "Top Skills" chart
+        top_skills = aggregates.skills.most_common(top_n)
+
+        # --- 3. Overall Skill Gap (Aggregated) ---
+        overall_skill_gap = {
+            "matched": aggregates.total_matched,
+            "missing": aggregates.total_missing
+        }
+
+        return {
+            "score_distribution": histogram_data,
+            "top_skills": [{"skill": s[0], "count": s[1]} for s in top_skills],
+            "overall_skill_gap": overall_skill_gap,
+            "total_candidates": len(session.resumes)
+        }
 
-    return {
-        "score_distribution": histogram_data,
-        "top_skills": [{"skill": s[0], "count": s[1]} for s in top_skills],
-        "overall_skill_gap": overall_skill_gap,
-        "total_candidates": len(db["resumes"])
-    }
 
 @router.get("/analytics", summary="Get data for dashboard visualization")
-async def get_analytics():
+async def get_analytics(
+    bin_width: int = Query(20, ge=1, le=100, description="Width of each score histogram bin, in percentage points"),
+    top_n: int = Query(8, ge=1, le=100, description="Number of top matched skills to return"),
+    session: Session = Depends(get_session),
+):
     """Returns calculated data for score distribution and skill summaries."""
     try:
-        return get_analytics_data()
+        return get_analytics_data(session, bin_width, top_n)
     except HTTPException as e:
         # Re-raise explicit HTTP exceptions (400, 404)
         raise e
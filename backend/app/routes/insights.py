@@ -1,29 +1,31 @@
 # app/routes/insights.py
 
-from fastapi import APIRouter, HTTPException
-from app.services.insights_service import get_skill_matches
-from app.routes.matcher import db # We need the shared 'db' to access the resume content
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from app.services.insights_service import get_skill_matches_many
+from app.services.session_service import Session, get_session # The session holds the resume content
 
 router = APIRouter()
 
 @router.get("/insights/{filename}")
-async def get_insights(filename: str):
+async def get_insights(filename: str, session: Session = Depends(get_session)):
     """
     Provides a skills-based breakdown for a specific resume.
     """
-    if not db["jd"]:
+    if not session.jd:
         raise HTTPException(status_code=404, detail="Job description not found.")
     
-    # Find the specific resume in our in-memory database
-    resume_found = next((r for r in db["resumes"] if r["filename"] == filename), None)
+    # Find the specific resume in the session
+    resume_found = session.resumes.get(filename)
     
     if not resume_found:
         raise HTTPException(status_code=404, detail=f"Resume '{filename}' not found.")
     
-    jd_text = db["jd"]["content"]
+    jd_text = session.jd["content"]
     resume_text = resume_found["content"]
     
-    skills_data = get_skill_matches(jd_text, resume_text)
+    # The spaCy model may still be loading; wait for it off the event loop
+    skills_data = (await run_in_threadpool(get_skill_matches_many, jd_text, [resume_text]))[0]
     
     return {
         "filename": filename,
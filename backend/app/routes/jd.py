@@ -1,19 +1,19 @@
 # jd.py (Updated)
 
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional
 from app.services.textextract_service import extract_text_from_file
+from app.services.session_service import Session, SessionLimitError, get_session
 import os
 
-# Import the shared 'db' from the matcher route
-from .matcher import db 
-
 router = APIRouter()
 
 @router.post("/upload-jd")
 async def upload_jd(
     jd_text: Optional[str] = Form(None),
-    jd_upload: Optional[UploadFile] = File(None)
+    jd_upload: Optional[UploadFile] = File(None),
+    session: Session = Depends(get_session)
 ):
     """
     Accept JD as plain text or upload a PDF/DOCX/TXT file,
@@ -27,7 +27,8 @@ async def upload_jd(
 
     if jd_upload:
         try:
-            content = extract_text_from_file(jd_upload.file, jd_upload.content_type)
+            # Parse in a worker thread so the event loop stays free
+            content = await run_in_threadpool(extract_text_from_file, jd_upload.file, jd_upload.content_type)
             filename = jd_upload.filename
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
@@ -37,11 +38,18 @@ async def upload_jd(
         content = jd_text.strip()
 
     # --- KEY ADDITION ---
-    # Store the extracted content and filename in the shared 'db' dictionary.
-    db["jd"] = {"filename": filename, "content": content}
+    # Store the extracted content and filename in the caller's session,
+    # replacing (not adding to) any previous JD.
+    previous_jd, session.jd = session.jd, None
+    try:
+        session.check_capacity(len(content))
+    except SessionLimitError as e:
+        session.jd = previous_jd
+        raise HTTPException(status_code=413, detail=str(e))
+    session.jd = {"filename": filename, "content": content}
     
     # Return a success message confirming the action.
     return {
         "message": "Job Description uploaded and processed successfully.",
-        "jd_details": db["jd"]
+        "jd_details": session.jd
     }
\ No newline at end of file
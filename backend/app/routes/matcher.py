@@ -1,21 +1,32 @@
+import asyncio
+import json
 import os
 import shutil
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from typing import List
+import time
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, UploadFile, File, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from app.services.preprocess_service import preprocess_text
 from app.services.embedding_service import generate_embedding
-from app.services.prediction_service import prediction_service
-from app.services.insights_service import get_skill_matches # import the insights matcher
-from app.services.textextract_service import extract_text_from_file # Corrected import to use your service
+from app.services.metrics_service import timed
+from app.services.match_service import MATCH_MODES, match_session
+from app.services.match_job_service import (
+    MatchJob, JobConflict, JobQueueFull, match_jobs, PARTIAL_RANKING_SIZE
+)
+from app.services.upload_service import ingest_resumes, save_and_extract
+from app.services.vector_index_service import index_resumes
+from app.services.session_service import (
+    Session, SessionLimitError, get_session, JD_UPLOAD_DIR, TEMP_RESUME_DIR, ACCEPTED_RESUME_DIR
+)
 router = APIRouter()
 
-# Simple in-memory storage for the current session's data
-db = {"jd": None, "resumes": []}
+# Each recruiter's JD and resumes live in a Session resolved per request
+# (X-Session-ID header or session_id query parameter), see session_service.
 
-# Define storage paths (assuming these are at the project root)
-JD_UPLOAD_DIR = "jd_files"
-TEMP_RESUME_DIR = "temp_resumes"
-ACCEPTED_RESUME_DIR = "accepted_resumes"
+# Progress streams check for job updates this often
+SSE_POLL_SECONDS = 0.5
+SSE_HEARTBEAT_SECONDS = 15
 
 # Ensure directories exist (important for the app to run)
 os.makedirs(JD_UPLOAD_DIR, exist_ok=True)
@@ -37,160 +48,242 @@ def clear_directory(directory_path: str):
             print(f'Failed to delete {file_path}. Reason: {e}')
             
 
+def add_resumes_to_session(session: Session, records: List[dict]) -> None:
+    """
+    Adds freshly ingested resumes to the session, or removes their files and
+    responds with 413 if they would push the session over its memory limit.
+    """
+    try:
+        session.check_capacity(sum(len(record["content"]) for record in records))
+    except SessionLimitError as e:
+        for record in records:
+            if os.path.exists(record["path"]):
+                os.remove(record["path"])
+        raise HTTPException(status_code=413, detail=str(e))
+    session.resumes.extend(records)
+
+
 @router.post("/upload-jd/")
-async def upload_jd(file: UploadFile = File(...)):
+async def upload_jd(file: UploadFile = File(...), session: Session = Depends(get_session)):
     """
     Uploads a new Job Description and performs a full session reset, 
     clearing all old JD and temp resume files.
     """
     try:
         # CRITICAL CLEANUP: Clear old JD and temp resume files for a clean slate
-        clear_directory(JD_UPLOAD_DIR)
-        clear_directory(TEMP_RESUME_DIR)
+        jd_dir = session.directory(JD_UPLOAD_DIR)
+        clear_directory(jd_dir)
+        clear_directory(session.directory(TEMP_RESUME_DIR))
         
         # Clear the in-memory database
-        db["jd"] = None
-        db["resumes"] = []
+        session.jd = None
+        session.resumes.clear()
 
-        # Save the new JD file
+        # Save the new JD file and extract its text from the same in-memory bytes
         jd_filename = file.filename
-        file_path = os.path.join(JD_UPLOAD_DIR, jd_filename)
-        
-        # Save the file to disk
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        file_path = os.path.join(jd_dir, jd_filename)
+        content = await save_and_extract(await file.read(), file_path, file.content_type)
+        session.check_capacity(len(content))
         
-        # The extractor needs the file stream and content type.
-        # We must re-open the saved file to get the stream.
-        with open(file_path, "rb") as saved_file:
-            # Pass the file stream and content type to your unified extractor
-            content = extract_text_from_file(saved_file, file.content_type)
-        
-        db["jd"] = {"filename": jd_filename, "content": content}
+        session.jd = {"filename": jd_filename, "content": content}
 
         return {"filename": jd_filename, "message": "Job Description uploaded and processed successfully. Session reset."}
+    except SessionLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to upload JD: {e}")
 
 @router.post("/upload-resumes/")
-async def upload_resumes(files: List[UploadFile] = File(...)):
+async def upload_resumes(background_tasks: BackgroundTasks, files: List[UploadFile] = File(...),
+                         session: Session = Depends(get_session)):
     """
     Uploads multiple resume files and clears old resumes from the temp directory 
     (if the JD was already uploaded).
     """
     # CRITICAL CLEANUP: Clear old resumes from the temp directory for a clean slate
-    clear_directory(TEMP_RESUME_DIR)
-    db["resumes"] = [] # Clear the in-memory resume list
-
-    uploaded_files = []
-    for file in files:
-        try:
-            resume_filename = file.filename
-            file_path = os.path.join(TEMP_RESUME_DIR, resume_filename)
-
-            # Save the file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            # The extractor needs the file stream and content type.
-            # We must re-open the saved file to get the stream.
-            with open(file_path, "rb") as saved_file:
-                # Pass the file stream and content type to your unified extractor
-                content = extract_text_from_file(saved_file, file.content_type)
-
-            db["resumes"].append({"filename": resume_filename, "content": content})
-            uploaded_files.append(resume_filename)
-            
-        except Exception as e:
-            print(f"Error processing {file.filename}: {e}")
-            continue # Continue to next file if one fails
+    resume_dir = session.directory(TEMP_RESUME_DIR)
+    clear_directory(resume_dir)
+    session.resumes.clear() # Clear the in-memory resume list
+
+    # Files are saved and parsed concurrently off the event loop
+    records, failed_files = await ingest_resumes(files, resume_dir)
+    add_resumes_to_session(session, records)
+    # Keep the cross-session talent pool up to date without delaying the response
+    background_tasks.add_task(index_resumes, records)
+    uploaded_files = [record["filename"] for record in records]
     
     if not uploaded_files:
-        raise HTTPException(status_code=500, detail="No resumes were uploaded successfully.")
+        raise HTTPException(status_code=500, detail={"message": "No resumes were uploaded successfully.", "failed_files": failed_files})
+
+    return {
+        "uploaded_files": uploaded_files,
+        "failed_files": failed_files,
+        "message": f"{len(uploaded_files)} resumes uploaded and processed successfully."
+    }
+
+def _check_matchable(session: Session, mode: str) -> None:
+    if mode not in MATCH_MODES:
+        raise HTTPException(status_code=400, detail="mode must be 'full' or 'two_stage'.")
+    if not session.jd:
+        raise HTTPException(status_code=404, detail="Job Description not uploaded.")
+    if not session.resumes:
+        raise HTTPException(status_code=404, detail="No resumes uploaded.")
+
+
+def _match_exclusively(session: Session, mode: str, top_k: Optional[int], min_similarity: Optional[float]) -> None:
+    with match_jobs.exclusive_match(session.id):
+        match_session(session, mode, top_k, min_similarity)
 
-    return {"uploaded_files": uploaded_files, "message": f"{len(uploaded_files)} resumes uploaded and processed successfully."}
 
 @router.post("/match/")
-async def match_resumes():
+async def match_resumes(
+    session: Session = Depends(get_session),
+    mode: str = Query("full", description="'full' scores every resume with the classifier; 'two_stage' pre-filters with embeddings"),
+    top_k: Optional[int] = Query(None, ge=1, description="two_stage: number of resumes sent to the classifier"),
+    min_similarity: Optional[float] = Query(None, ge=-1.0, le=1.0, description="two_stage: minimum cosine similarity for the classifier"),
+):
     """
     Orchestrates the resume matching process by using the prediction service
     and combines it with insights for a hybrid Fit Score.
+    In two_stage mode only the resumes closest to the JD by embedding
+    similarity go through the classifier; the rest keep embedding-only scores.
+    For large pools prefer POST /match/jobs, which returns immediately.
     """
-    if not db["jd"]:
-        raise HTTPException(status_code=404, detail="Job Description not uploaded.")
-    if not db["resumes"]:
-        raise HTTPException(status_code=404, detail="No resumes uploaded.")
-
-    # Extract content for batch processing
-    resume_contents = [resume["content"] for resume in db["resumes"]]
-    jd_content = db["jd"]["content"]
+    _check_matchable(session, mode)
 
-    # Get hybrid predictions from the PredictionService
-    predictions = prediction_service.predict_batch(resume_contents, jd_content)
-
-    # We will build the ranked list here, but first, ensure the scores are 
-    # written back to the original db["resumes"] list for /analytics access.
-    ranked_resumes = []
-    
-    for i, resume in enumerate(db["resumes"]):
-        pred = predictions[i]
+    # Inference runs in a worker thread so the event loop stays responsive;
+    # scores are written back to the session's records for /analytics access.
+    try:
+        await run_in_threadpool(_match_exclusively, session, mode, top_k, min_similarity)
+    except JobConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "job_id": e.job_id})
 
-        # Hybrid fit score from ML + skill insights
-        hybrid_score = pred.get("hybrid_fit_score", pred["fit_probability"]) * 100
-        prediction_label = pred.get("prediction", "Fit")
+    # The collection keeps resumes ranked by hybrid score (highest first)
+    with timed("ranking"):
+        ranked_resumes = session.resumes.ranked()
 
-        # Extract matched/missing skills for transparency
-        skill_breakdown = get_skill_matches(jd_content, resume_contents[i])
+    return {"ranked_resumes": ranked_resumes}
 
-        # === FIX: INJECT THE MATCHING DATA INTO THE ORIGINAL DB OBJECT ===
-        resume["score"] = round(hybrid_score, 2)
-        resume["prediction"] = prediction_label
-        resume["matched_skills"] = skill_breakdown["matched_skills"]
-        resume["missing_skills"] = skill_breakdown["missing_skills"]
-        # ================================================================
 
-        # Add the updated resume object (which now contains score and skills) to the list to be ranked
-        ranked_resumes.append(resume)
+# ----------------- Asynchronous Match Jobs -----------------
+async def _get_job(job_id: str, session: Session) -> MatchJob:
+    # Jobs are only visible to the session that submitted them; with several
+    # workers they may be running in another process
+    job = await run_in_threadpool(match_jobs.get, job_id, session)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Match job '{job_id}' not found.")
+    return job
 
-    # Rank the results by hybrid score (highest first)
-    ranked_resumes.sort(key=lambda x: x["score"], reverse=True)
 
-    return {"ranked_resumes": ranked_resumes}
+@router.post("/match/jobs", status_code=202, summary="Start matching in the background and return a job ID")
+async def submit_match_job(
+    session: Session = Depends(get_session),
+    mode: str = Query("full", description="'full' scores every resume with the classifier; 'two_stage' pre-filters with embeddings"),
+    top_k: Optional[int] = Query(None, ge=1, description="two_stage: number of resumes sent to the classifier"),
+    min_similarity: Optional[float] = Query(None, ge=-1.0, le=1.0, description="two_stage: minimum cosine similarity for the classifier"),
+):
+    """
+    Queues a match of the session's resumes on the bounded match worker pool.
+    Follow it with GET /match/jobs/{job_id} or the /events stream.
+    """
+    _check_matchable(session, mode)
+    try:
+        job = await run_in_threadpool(match_jobs.submit, session, mode, top_k, min_similarity)
+    except JobConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "job_id": e.job_id})
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return job.describe(ranking_limit=0)
+
+
+@router.get("/match/jobs/{job_id}", summary="Status, progress and ranking of a match job")
+async def get_match_job(
+    job_id: str,
+    session: Session = Depends(get_session),
+    limit: Optional[int] = Query(None, ge=1, description="Number of ranked resumes to include (default: all once finished)"),
+):
+    job = await _get_job(job_id, session)
+    return job.describe(ranking_limit=limit or (None if job.finished else PARTIAL_RANKING_SIZE))
+
+
+@router.get("/match/jobs/{job_id}/events", summary="Server-Sent Events stream of a match job's progress")
+async def stream_match_job(job_id: str, request: Request, session: Session = Depends(get_session)):
+    """
+    Streams 'progress' events with the partial ranking whenever scoring
+    advances, then one final 'completed', 'failed' or 'cancelled' event.
+    """
+    job = await _get_job(job_id, session)
+
+    async def events():
+        nonlocal job
+        sent_version = -1
+        last_sent = time.monotonic()
+        while True:
+            if await request.is_disconnected():
+                return
+            if job.remote:
+                job = await run_in_threadpool(match_jobs.refresh, job)
+            if job.version != sent_version:
+                sent_version = job.version
+                event = job.status if job.finished else "progress"
+                yield f"event: {event}\ndata: {json.dumps(job.describe())}\n\n"
+                last_sent = time.monotonic()
+                if job.finished:
+                    return
+            elif time.monotonic() - last_sent > SSE_HEARTBEAT_SECONDS:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(SSE_POLL_SECONDS)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.delete("/match/jobs/{job_id}", summary="Cancel a queued or running match job")
+async def cancel_match_job(job_id: str, session: Session = Depends(get_session)):
+    """
+    Cancels the job. A running job stops before its next micro-batch and
+    keeps the scores written so far.
+    """
+    job = await run_in_threadpool(match_jobs.cancel, await _get_job(job_id, session))
+    return job.describe(ranking_limit=0)
 
 
 @router.post("/reset/")
-async def reset_session():
+async def reset_session(session: Session = Depends(get_session)):
     """
     Performs a FULL session reset: Clears stored JD/resumes from memory 
-    AND deletes all files from jd_files and temp_resumes directories.
+    AND deletes all of the session's files from jd_files and temp_resumes.
     """
     # 1. Clear file system directories
-    clear_directory(JD_UPLOAD_DIR)
-    clear_directory(TEMP_RESUME_DIR)
+    clear_directory(session.directory(JD_UPLOAD_DIR))
+    clear_directory(session.directory(TEMP_RESUME_DIR))
     # NOTE: Accepted resumes remain in ACCEPTED_RESUME_DIR until manually moved/deleted.
 
     # 2. Clear in-memory data
-    db["jd"] = None
-    db["resumes"] = []
+    session.jd = None
+    session.resumes.clear()
     
     return {"message": "Full session reset complete. All temporary files deleted."}
 
 
 @router.delete("/reject-resume/{filename}", summary="Removes resume from disk and memory")
-async def reject_resume(filename: str):
+async def reject_resume(filename: str, session: Session = Depends(get_session)):
     """
     Deletes the specified resume file from the 'temp_resumes' folder
     and removes its metadata from the in-memory database.
     """
-    # 1. Remove from in-memory list (db["resumes"])
-    initial_count = len(db["resumes"])
-    db["resumes"] = [r for r in db["resumes"] if r["filename"] != filename]
-    if len(db["resumes"]) == initial_count:
+    # 1. Remove from the session's resume collection
+    if session.resumes.remove(filename) is None:
         # The resume was not found in the list, but we still try to delete the file
         print(f"Warning: Resume {filename} not found in in-memory list.")
 
     # 2. Remove file from disk
-    file_path = os.path.join(TEMP_RESUME_DIR, filename)
+    file_path = os.path.join(session.directory(TEMP_RESUME_DIR), filename)
     try:
         if os.path.exists(file_path):
             os.remove(file_path)
@@ -202,7 +295,7 @@ async def reject_resume(filename: str):
         raise HTTPException(status_code=500, detail=f"Failed to delete file {filename}: {e}")
 
 @router.post("/accept-resume/{filename}", summary="Moves resume to the accepted directory")
-async def accept_resume(filename: str):
+async def accept_resume(filename: str, session: Session = Depends(get_session)):
     """
     Moves the specified resume file from the 'temp_resumes' folder
     to the 'accepted_resumes' folder and removes its metadata from the 
@@ -210,8 +303,8 @@ async def accept_resume(filename: str):
     """
     
     # 1. Define source and destination paths
-    source_path = os.path.join(TEMP_RESUME_DIR, filename)
-    destination_path = os.path.join(ACCEPTED_RESUME_DIR, filename)
+    source_path = os.path.join(session.directory(TEMP_RESUME_DIR), filename)
+    destination_path = os.path.join(session.directory(ACCEPTED_RESUME_DIR), filename)
 
     # 2. Check if the file exists in the source (temp) directory
     if not os.path.exists(source_path):
@@ -221,8 +314,8 @@ async def accept_resume(filename: str):
         # 3. Move the file
         shutil.move(source_path, destination_path)
         
-        # 4. Remove from in-memory list (db["resumes"])
-        db["resumes"] = [r for r in db["resumes"] if r["filename"] != filename]
+        # 4. Remove from the session's resume collection
+        session.resumes.remove(filename)
 
         return {"message": f"Resume {filename} accepted and moved to accepted_resumes."}
     except Exception as e:
@@ -1,106 +1,118 @@
-import io
-from typing import List, Dict, Any, Optional
-from fastapi import APIRouter, Query, HTTPException
-from fastapi.responses import StreamingResponse
+import os
+from typing import List, Dict, Any, Iterator, Optional
+from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
 
 # IMPORTANT: Ensure these imports are correct based on your project structure.
-# We need access to the data store (db) and the scoring/insights functions.
-from app.routes.matcher import db # Assuming 'db' (data store) is defined/imported in app.routes.matcher
+# We need access to the caller's session and the scoring/insights functions.
+from app.services.match_service import apply_prediction, is_scored
+from app.services.metrics_service import timed, timed_iter
+from app.services.session_service import Session, get_session
 from app.services.prediction_service import prediction_service as scoring_service 
-from app.services.insights_service import get_skill_matches 
 
 # Import the reporting service functions you just defined
-from app.services.report_service import generate_excel_report, generate_csv_report, generate_resumes_zip
+from app.services.report_service import write_excel_report, iter_csv_report, iter_resumes_zip
 
 router = APIRouter()
 
-def _prepare_ranked_data() -> List[Dict[str, Any]] | None:
+def _prepare_ranked_data(session: Session, limit: Optional[int] = None) -> List[Dict[str, Any]] | None:
     """
-    Calculates scores, extracts skills, and ranks the resumes currently in db["resumes"].
-    Returns None if essential data is missing.
+    Ranks the resumes currently in the session using the scores stored by /match/.
+    Resumes without a score for the current JD are scored in one batched pass first.
+    Returns the top `limit` resume records, or None if essential data is missing.
     """
-    # Use .get() for safer access in case keys are missing
-    if not db.get("jd") or not db.get("resumes"):
+    if not session.jd or not session.resumes:
         return None
 
-    jd_text = db["jd"]["content"]
-    report_data = []
-    
-    # 1. Gather data and calculate scores/insights
-    for resume in db["resumes"]:
-        resume_text = resume["content"]
-        
-        # Re-run prediction and insights to ensure up-to-date data for the report
-        prediction_result = scoring_service.predict(resume_text, jd_text)
-        skills_data = get_skill_matches(jd_text, resume_text)
-        
-        # --- KEY FIX ---
-        # The prediction service returns a string like "85.50%". We must convert it to a number.
-        hybrid_score_str = prediction_result["hybrid_fit_score"]
-        # Strip the '%' sign and convert the result to a float for calculation.
-        relevance_score = float(hybrid_score_str.strip('%')) 
-        
-        # We store the float value for sorting and the formatted string for display.
-        report_data.append({
-            "Resume Filename": resume["filename"],
-            # Store the score as an integer percentage for sorting and Excel
-            "Relevance Score (%)": int(round(relevance_score)),
-            "Matched Skills": ", ".join(skills_data["matched_skills"]),
-            "Missing Skills": ", ".join(skills_data["missing_skills"]),
-        })
+    jd_text = session.jd["content"]
+    jd_hash = session.jd["hash"]
+
+    # 1. Score only what /match/ hasn't already scored, and keep the results
+    unscored = [resume for resume in session.resumes if not is_scored(resume, jd_hash)]
+    if unscored:
+        predictions = scoring_service.predict_batch([resume["content"] for resume in unscored], jd_text)
+        for resume, pred in zip(unscored, predictions):
+            with session.resumes.lock:
+                if session.resumes.get(resume["filename"]) is resume:
+                    apply_prediction(resume, pred, jd_hash)
+                    session.resumes.reposition(resume["filename"])
+
+    # 2. Already sorted by score (embedding-only scores from two-stage matching rank last)
+    with timed("ranking"):
+        return session.resumes.ranked(limit if limit is not None and limit > 0 else None)
 
-    # 2. Sort by score
-    sorted_data = sorted(report_data, key=lambda x: x["Relevance Score (%)"], reverse=True)
 
-    # 3. Add rank
-    for i, item in enumerate(sorted_data):
-        item["Rank"] = i + 1
+def _iter_report_rows(ranked_resumes: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Builds report rows one at a time, so writers can stream them."""
+    for rank, resume in enumerate(ranked_resumes, start=1):
+        yield {
+            "Rank": rank,
+            "Resume Filename": resume["filename"],
+            # Store the score as an integer percentage for sorting and Excel
+            "Relevance Score (%)": int(round(resume["score"])),
+            "Matched Skills": ", ".join(resume.get("matched_skills", [])),
+            "Missing Skills": ", ".join(resume.get("missing_skills", [])),
+        }
 
-    return sorted_data
 
 @router.get("/reports/export-excel", summary="Export Ranked Resumes & Skills to Excel")
-async def export_excel_report(limit: Optional[int] = Query(None, description="Limit the number of resumes to export")):
-    """Delegates to the service layer to generate and stream an Excel file."""
-    ranked_data = _prepare_ranked_data()
-    if ranked_data is None:
+async def export_excel_report(limit: Optional[int] = Query(None, description="Limit the number of resumes to export"),
+                              session: Session = Depends(get_session)):
+    """
+    Writes the Excel file row by row to a temporary file off the event loop,
+    then sends it from disk and deletes it.
+    """
+    ranked_resumes = await run_in_threadpool(_prepare_ranked_data, session, limit)
+    if ranked_resumes is None:
         raise HTTPException(status_code=404, detail="No job description or resumes have been uploaded.")
-    
-    # Apply limit
-    if limit is not None and limit > 0:
-        ranked_data = ranked_data[:limit]
 
-    excel_buffer = generate_excel_report(ranked_data)
+    with timed("report_excel"):
+        report_path = await run_in_threadpool(write_excel_report, _iter_report_rows(ranked_resumes))
     
-    return StreamingResponse(
-        content=excel_buffer,
+    return FileResponse(
+        report_path,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=resume_insights.xlsx"}
+        filename="resume_insights.xlsx",
+        background=BackgroundTask(os.remove, report_path)
+    )
+
+
+@router.get("/reports/export-csv", summary="Export Ranked Resumes & Skills to CSV")
+async def export_csv_report(limit: Optional[int] = Query(None, description="Limit the number of resumes to export"),
+                            session: Session = Depends(get_session)):
+    """Streams the CSV report as rows are encoded."""
+    ranked_resumes = await run_in_threadpool(_prepare_ranked_data, session, limit)
+    if ranked_resumes is None:
+        raise HTTPException(status_code=404, detail="No job description or resumes have been uploaded.")
+
+    return StreamingResponse(
+        content=timed_iter("report_csv", iter_csv_report(_iter_report_rows(ranked_resumes))),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=resume_insights.csv"}
     )
 
 
 @router.get("/reports/download-resumes-zip", summary="Download all remaining ranked resumes as a ZIP file")
-async def download_remaining_resumes(limit: Optional[int] = Query(None, description="Limit the number of resumes to download")):
+async def download_remaining_resumes(limit: Optional[int] = Query(None, description="Limit the number of resumes to download"),
+                                     session: Session = Depends(get_session)):
     """
-    Creates a ZIP archive containing the top N resume files based on the ranked list (db['resumes']).
+    Creates a ZIP archive containing the top N resume files based on the session's ranked list.
     """
-    if not db.get("resumes"):
+    if not session.resumes:
         raise HTTPException(status_code=404, detail="No resumes remain in the current ranked list to download.")
     
-    # Sort the resumes by score before applying the limit
+    # Take the top resumes from the score-sorted view
     # This assumes a 'score' key is added by a /match endpoint.
-    sorted_resumes = sorted(db["resumes"], key=lambda r: r.get("score", 0), reverse=True)
-    
-    # Apply the limit to the sorted list
-    resumes_to_zip = sorted_resumes[:limit] if limit is not None and limit > 0 else sorted_resumes
+    resumes_to_zip = session.resumes.ranked(limit if limit is not None and limit > 0 else None)
 
     if not resumes_to_zip:
         raise HTTPException(status_code=404, detail="No resumes found for the specified limit.")
 
-    # Pass the correctly filtered list of resume dictionaries to the service function
-    zip_buffer = generate_resumes_zip(resumes_to_zip)
-
+    # The archive is built while it is sent; file reads run in a worker thread
     return StreamingResponse(
-        content=zip_buffer,
+        content=timed_iter("report_zip", iter_resumes_zip(resumes_to_zip)),
         media_type="application/zip",
         headers={"Content-Disposition": "attachment; filename=ranked_resumes.zip"}
     )
\ No newline at end of file
@@ -1,44 +1,33 @@
-import os
-import shutil
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File
 from typing import List
-from app.services.textextract_service import extract_text_from_file
-from .matcher import db # Import the shared 'db'
+from app.services.upload_service import ingest_resumes
+from app.services.vector_index_service import index_resumes
+from app.services.session_service import Session, get_session, TEMP_RESUME_DIR
+from .matcher import add_resumes_to_session
 
 router = APIRouter()
 
 @router.post("/upload-resumes/")
-async def upload_resumes(files: List[UploadFile] = File(...)):
+async def upload_resumes(background_tasks: BackgroundTasks, files: List[UploadFile] = File(...),
+                         session: Session = Depends(get_session)):
     """
     Endpoint to upload one or more resume files, store them on the server,
     extract their text, and save the content for the matching process.
     """
-    # Create the temporary directory if it doesn't exist
-    if not os.path.exists("./temp_resumes"):
-        os.makedirs("./temp_resumes")
-    
-    # Clear any old resumes from the database and temp folder to start a fresh session
-    db["resumes"] = []
-    
-    for file in files:
-        # Save the file to the temporary folder
-        file_path = f"./temp_resumes/{file.filename}"
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Extract the text content
-        # Note: You need to reopen the file since the stream was consumed
-        with open(file_path, "rb") as saved_file:
-            content = extract_text_from_file(saved_file, file.content_type)
+    # Clear any old resumes from the session to start fresh
+    session.resumes.clear()
+
+    # Files are saved and parsed concurrently off the event loop, storing each file's path
+    records, failed_files = await ingest_resumes(files, session.directory(TEMP_RESUME_DIR))
+    add_resumes_to_session(session, records)
+    # Keep the cross-session talent pool up to date without delaying the response
+    background_tasks.add_task(index_resumes, records)
 
-        # Add the resume data to the shared 'db', including the file path
-        db["resumes"].append({
-            "filename": file.filename,
-            "content": content,
-            "path": file_path # 💡 We now store the file's path
-        })
+    if not records:
+        raise HTTPException(status_code=500, detail={"message": "No resumes were uploaded successfully.", "failed_files": failed_files})
     
     return {
-        "message": f"{len(db['resumes'])} resumes uploaded and processed successfully.",
-        "filenames": [r["filename"] for r in db["resumes"]]
-    }
\ No newline at end of file
+        "message": f"{len(session.resumes)} resumes uploaded and processed successfully.",
+        "filenames": [r["filename"] for r in session.resumes],
+        "failed_files": failed_files
+    }
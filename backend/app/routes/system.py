@@ -0,0 +1,98 @@
+# app/routes/system.py
+
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.services.insights_service import get_skill_cache_stats
+from app.services.embedding_service import embedding_cache
+from app.services.score_cache_service import score_cache
+from app.services.textextract_service import get_extraction_stats
+from app.services.model_loader_service import OFFLINE, all_ready, models_status
+from app.services.session_service import session_store
+from app.services.metrics_service import aggregate_workers, render_prometheus, snapshot
+from app.services.prediction_service import prediction_service, token_cache
+
+router = APIRouter()
+
+@router.get("/cache-stats", summary="Hit-rate statistics for the skill and score caches")
+async def get_cache_stats():
+    """
+    Reports size and hit/miss counters for the in-memory skill, embedding and
+    token caches and the persistent score cache.
+    """
+    # The score cache stats touch its database file, so they stay off the event loop
+    return {
+        "skill_cache": get_skill_cache_stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "score_cache": await run_in_threadpool(score_cache.stats) if score_cache else {"enabled": False},
+    }
+
+
+@router.get("/extraction-stats", summary="Per-format text extraction time and byte counts")
+async def get_extraction_statistics():
+    """
+    Reports how many files of each detected format were parsed, their total
+    size and the time spent extracting them.
+    """
+    return {"formats": get_extraction_stats()}
+
+
+@router.get("/inference-stats", summary="Batching statistics of the shared inference scheduler")
+async def get_inference_stats():
+    """Reports queue depth, batches run, mean batch size and mean queue wait."""
+    return prediction_service.scheduler.stats()
+
+
+@router.get("/session-stats", summary="Number and memory use of active sessions")
+async def get_session_stats():
+    """Reports the session store backend, active sessions and their total text size."""
+    return await run_in_threadpool(session_store.stats)
+
+
+@router.get("/metrics", summary="Stage timings, counters and cache statistics in Prometheus format")
+async def get_metrics():
+    """
+    Exposes per-stage duration histograms (extraction, tokenization, inference,
+    NER, embedding, ranking, reports), work counters and cache hit rates for
+    Prometheus to scrape. With several workers the totals cover all of them.
+    """
+    return PlainTextResponse(await run_in_threadpool(_render_metrics), media_type="text/plain; version=0.0.4")
+
+
+def process_metrics() -> dict:
+    """Snapshot of the metrics this worker process holds on its own."""
+    caches = {
+        "skill": get_skill_cache_stats(),
+        "embedding": embedding_cache.stats(),
+        "token": token_cache.stats(),
+    }
+    if score_cache:
+        # Lookups are per process; the entry count is shared and added at render time
+        caches["score"] = {"hits": score_cache.hits, "misses": score_cache.misses}
+    return snapshot(caches, {"inference_queue_depth": prediction_service.scheduler.stats()["queued"]})
+
+
+def _render_metrics() -> str:
+    # Blocking: snapshots are files and the session store stats go to SQLite
+    metrics = aggregate_workers(process_metrics())
+    if score_cache:
+        metrics["caches"].setdefault("score", {})["entries"] = score_cache.stats()["entries"]
+    gauges = {
+        "models_ready": int(all_ready()),
+        "sessions": session_store.stats()["sessions"],
+    }
+    return render_prometheus(metrics, gauges)
+
+
+@router.get("/ready", summary="Readiness probe reporting each model's load state")
+async def get_readiness():
+    """
+    Reports the load state and load duration of every model. Responds with 503
+    until all of them are loaded, so load balancers can hold traffic back.
+    """
+    ready = all_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "offline": OFFLINE, "models": models_status()},
+    )
@@ -0,0 +1,47 @@
+# app/routes/talent_pool.py
+
+from typing import Optional
+from fastapi import APIRouter, Depends, Form, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from app.services.vector_index_service import talent_pool, IVF_NPROBE
+from app.services.session_service import Session, get_session
+
+router = APIRouter()
+
+
+def _require_pool():
+    if talent_pool is None:
+        raise HTTPException(status_code=503, detail="The talent pool is disabled (HIRESENSE_TALENT_POOL=0).")
+    return talent_pool
+
+
+@router.post("/talent-pool/search", summary="Search every previously uploaded resume for a JD")
+async def search_talent_pool(
+    jd_text: Optional[str] = Form(None),
+    top_k: int = Query(20, ge=1, le=1000, description="Number of candidates to return"),
+    nprobe: Optional[int] = Query(None, ge=1, description="IVF lists to probe (higher is slower but more exact)"),
+    session: Session = Depends(get_session),
+):
+    """
+    Ranks the historical talent pool by embedding similarity to the given JD text,
+    or to the current session's JD if none is given.
+    """
+    pool = _require_pool()
+    query = jd_text or (session.jd["content"] if session.jd else None)
+    if not query:
+        raise HTTPException(status_code=404, detail="Provide jd_text or upload a Job Description first.")
+
+    results = await run_in_threadpool(pool.search, query, top_k, nprobe or IVF_NPROBE)
+    return {"results": results, "pool_size": len(pool)}
+
+
+@router.get("/talent-pool/stats", summary="Size and index state of the talent pool")
+async def get_talent_pool_stats():
+    return _require_pool().stats()
+
+
+@router.post("/talent-pool/rebuild-index", summary="Rebuild the approximate nearest-neighbour index")
+async def rebuild_talent_pool_index():
+    pool = _require_pool()
+    await run_in_threadpool(pool.rebuild_index)
+    return {"message": "Talent pool index rebuilt.", **pool.stats()}
@@ -1,14 +1,16 @@
 # app/routes/viewer.py
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from app.services.view_service import get_resume_file
+from app.services.session_service import Session, get_session, TEMP_RESUME_DIR
 
 router = APIRouter()
 
 @router.get("/resumes/{filename}")
-async def view_resume(filename: str):
+async def view_resume(filename: str, request: Request, session: Session = Depends(get_session)):
     """
     Handles the API request to view a specific resume file.
     """
-    # 💡 CHANGE: Remove the filename argument to prevent forced download
-    return get_resume_file(filename)
\ No newline at end of file
+    # Served inline from disk; Range and conditional requests are honoured
+    return await run_in_threadpool(get_resume_file, filename, session.directory(TEMP_RESUME_DIR), request.headers)
\ No newline at end of file
@@ -1,22 +1,69 @@
-from sentence_transformers import SentenceTransformer
+import os
+import numpy as np
+from app.services.metrics_service import increment, timed
+from app.services.model_loader_service import OFFLINE, register_model
+from app.utils.cache_utils import LRUCache, content_hash
 
-# Load the model once when the app starts for efficiency.
-try:
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    print("SentenceTransformer model loaded successfully.")
-except Exception as e:
-    print(f"Error loading SentenceTransformer model: {e}")
-    model = None
+# Texts encoded per forward pass by the bulk API
+EMBED_BATCH_SIZE = int(os.getenv("HIRESENSE_EMBED_BATCH_SIZE", "64"))
+# Embeddings kept in memory by content hash (~1.5 KB each for MiniLM)
+EMBED_CACHE_SIZE = int(os.getenv("HIRESENSE_EMBED_CACHE_SIZE", "20000"))
 
+# Hub model name or a local directory holding the model
+EMBEDDING_MODEL = os.getenv("HIRESENSE_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
 
-def generate_embedding(text : str) -> list[float]:
+
+def _load_embedding_model():
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(EMBEDDING_MODEL, local_files_only=OFFLINE)
+
+
+# Loaded on first use or by the startup warm-up
+embedding_model = register_model("embedding", _load_embedding_model)
+
+embedding_cache = LRUCache(EMBED_CACHE_SIZE)
+
+
+def generate_embedding(text : str) -> np.ndarray:
     """
     Generates a numerical vector (embedding) for a given text.
     """
-    if model is None:
-        raise RuntimeError("Embedding model is not available.")
-    
-    embedding = model.encode(text)
+    return generate_embeddings([text])[0]
+
+
+def generate_embeddings(texts: list[str]) -> np.ndarray:
+    """
+    Encodes many texts and returns a contiguous float32 (len(texts), dim) matrix
+    of unit-length embeddings. Only texts missing from the cache are encoded,
+    all in a single model.encode call.
+    """
+    keys = [content_hash(text) for text in texts]
+    rows = [embedding_cache.get(key) for key in keys]
+
+    pending = {}  # Deduplicated cache misses: key -> text
+    for key, text, row in zip(keys, texts, rows):
+        if row is None:
+            pending.setdefault(key, text)
 
-    return embedding.tolist()
+    if pending:
+        with timed("embedding"):
+            encoded = embedding_model.get().encode(
+                list(pending.values()), batch_size=EMBED_BATCH_SIZE,
+                normalize_embeddings=True, convert_to_numpy=True
+            ).astype(np.float32, copy=False)
+        increment("embedded_documents", len(pending))
+        for key, vector in zip(pending.keys(), encoded):
+            vector = vector.copy()
+            vector.flags.writeable = False  # Shared through the cache
+            embedding_cache.put(key, vector)
+            pending[key] = vector
 
+    if not texts:
+        return np.empty((0, embedding_model.get().get_sentence_embedding_dimension()), dtype=np.float32)
+    # Fully cached calls never need the model
+    dim = len(rows[0]) if rows[0] is not None else len(pending[keys[0]])
+    matrix = np.empty((len(texts), dim), dtype=np.float32)
+    for i, (key, row) in enumerate(zip(keys, rows)):
+        matrix[i] = row if row is not None else pending[key]
+    return matrix
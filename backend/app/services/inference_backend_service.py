@@ -0,0 +1,203 @@
+# app/services/inference_backend_service.py
+
+import os
+import numpy as np
+
+from app.services.model_loader_service import OFFLINE
+
+# torch and transformers are imported inside the functions that need them so
+# importing this module (and starting the API) stays fast.
+
+# --- Model location ---
+MODEL_FOLDER_NAME = "hiresense_hybrid_model"
+
+try:
+    SERVICE_FILE_DIR = os.path.dirname(os.path.abspath(__file__))
+    PROJECT_ROOT = os.path.abspath(os.path.join(SERVICE_FILE_DIR, "..", "..", ".."))
+    MODEL_PATH = os.path.join(PROJECT_ROOT, MODEL_FOLDER_NAME)
+except NameError:
+    PROJECT_ROOT = ".."
+    MODEL_PATH = f"../{MODEL_FOLDER_NAME}"
+
+# --- Backend selection ---
+# torch       : fp32 PyTorch (default)
+# torch-int8  : PyTorch with dynamic INT8 quantization of the Linear layers (CPU)
+# onnx        : ONNX Runtime export of the same checkpoint
+# onnx-int8   : ONNX Runtime export with dynamic INT8 weights
+INFERENCE_BACKEND = os.getenv("HIRESENSE_INFERENCE_BACKEND", "torch")
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+ONNX_DIR_NAME = "onnx"
+ONNX_FILES = {"onnx": "model.onnx", "onnx-int8": "model.int8.onnx"}
+PARITY_DATASET_PATH = os.path.join(PROJECT_ROOT, "check", "synthetic_resume_dataset.csv")
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def get_device() -> str:
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+class TorchBackend:
+    """Runs the classifier with PyTorch, optionally dynamically quantized to INT8."""
+
+    def __init__(self, model_path: str, quantize: bool = False):
+        import torch
+        from transformers import AutoModelForSequenceClassification
+
+        model = AutoModelForSequenceClassification.from_pretrained(model_path, local_files_only=OFFLINE)
+        self.device = get_device()
+        if quantize:
+            # Dynamic quantization only targets CPU kernels
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self.device = "cpu"
+        self.model = model.to(self.device)
+        self.model.eval()
+        self.name = "torch-int8" if quantize else "torch"
+        self._torch = torch
+
+    def predict_proba(self, inputs: dict) -> np.ndarray:
+        torch = self._torch
+        tensors = {
+            key: torch.as_tensor(value).to(self.device)
+            for key, value in inputs.items()
+            if key in ("input_ids", "attention_mask")
+        }
+        with torch.no_grad():
+            logits = self.model(**tensors).logits
+        return torch.softmax(logits, dim=1).cpu().numpy()
+
+
+class OnnxBackend:
+    """Runs an ONNX export of the classifier with ONNX Runtime on CPU."""
+
+    def __init__(self, model_path: str, name: str = "onnx"):
+        import onnxruntime as ort  # Optional dependency, only needed for this backend
+
+        onnx_path = os.path.join(model_path, ONNX_DIR_NAME, ONNX_FILES[name])
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(
+                f"ONNX model not found at '{onnx_path}'. Run 'python export_model.py export' first."
+            )
+        self.session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.name = name
+
+    def predict_proba(self, inputs: dict) -> np.ndarray:
+        feed = {
+            key: np.asarray(value, dtype=np.int64)
+            for key, value in inputs.items()
+            if key in self.input_names
+        }
+        logits = self.session.run(["logits"], feed)[0]
+        return _softmax(logits)
+
+
+def load_backend(name: str = INFERENCE_BACKEND, model_path: str = MODEL_PATH):
+    """Builds the inference backend selected by name."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'. Expected one of {BACKENDS}.")
+    if name.startswith("onnx"):
+        return OnnxBackend(model_path, name)
+    return TorchBackend(model_path, quantize=(name == "torch-int8"))
+
+
+# ----------------- Export -----------------
+def export_onnx(model_path: str = MODEL_PATH, quantize: bool = True, opset: int = 17) -> list:
+    """
+    Exports the fp32 checkpoint to ONNX (and optionally an INT8 copy) under
+    <model_path>/onnx/. Returns the paths written.
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    class _LogitsOnly(torch.nn.Module):
+        """Wraps the classifier so the exported graph returns a plain logits tensor."""
+
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+    output_dir = os.path.join(model_path, ONNX_DIR_NAME)
+    os.makedirs(output_dir, exist_ok=True)
+    onnx_path = os.path.join(output_dir, ONNX_FILES["onnx"])
+
+    model = AutoModelForSequenceClassification.from_pretrained(model_path).eval()
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    dummy = tokenizer("sample resume", "sample job description", return_tensors="pt")
+
+    torch.onnx.export(
+        _LogitsOnly(model),
+        (dummy["input_ids"], dummy["attention_mask"]),
+        onnx_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"},
+        },
+        opset_version=opset,
+    )
+    written = [onnx_path]
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        int8_path = os.path.join(output_dir, ONNX_FILES["onnx-int8"])
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+        written.append(int8_path)
+
+    return written
+
+
+# ----------------- Parity Check -----------------
+def parity_check(name: str, model_path: str = MODEL_PATH, dataset_path: str = PARITY_DATASET_PATH,
+                 limit: int | None = None, batch_size: int = 16, max_length: int = 512) -> dict:
+    """
+    Compares the Fit probabilities of a backend against the fp32 torch model on
+    the synthetic resume dataset and reports the probability drift.
+    """
+    import pandas as pd
+    from transformers import AutoTokenizer
+
+    df = pd.read_csv(dataset_path).dropna()
+    if limit:
+        df = df.head(limit)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    reference = TorchBackend(model_path)
+    candidate = load_backend(name, model_path)
+
+    resumes = df["resume_text"].tolist()
+    jds = df["job_description_text"].tolist()
+    drifts = []
+    agreements = 0
+
+    for start in range(0, len(resumes), batch_size):
+        inputs = tokenizer(
+            resumes[start:start + batch_size], jds[start:start + batch_size],
+            return_tensors="np", padding=True, truncation=True, max_length=max_length
+        )
+        ref_probs = reference.predict_proba(inputs)
+        cand_probs = candidate.predict_proba(inputs)
+        drifts.append(np.abs(ref_probs[:, 1] - cand_probs[:, 1]))
+        agreements += int((ref_probs.argmax(axis=1) == cand_probs.argmax(axis=1)).sum())
+
+    drift = np.concatenate(drifts) if drifts else np.zeros(0)
+    return {
+        "backend": name,
+        "pairs": int(drift.size),
+        "max_abs_drift": float(drift.max()) if drift.size else 0.0,
+        "mean_abs_drift": float(drift.mean()) if drift.size else 0.0,
+        "label_agreement": agreements / drift.size if drift.size else 1.0,
+    }
@@ -0,0 +1,102 @@
+# app/services/inference_scheduler_service.py
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, List
+
+import numpy as np
+
+from app.services.metrics_service import increment, observe
+
+
+class _Request:
+    __slots__ = ("sequence", "future", "enqueued")
+
+    def __init__(self, sequence: List[int]):
+        self.sequence = sequence
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+class InferenceScheduler:
+    """
+    Dynamic batching in front of a model: sequences submitted by any number of
+    callers are queued, and a single worker thread runs them in batches of up
+    to max_batch_size, waiting at most max_wait_ms for a batch to fill. Only
+    one model invocation runs at a time; each caller gets a Future per sequence.
+    """
+
+    def __init__(self, run_batch: Callable[[List[List[int]]], np.ndarray], max_batch_size: int,
+                 max_wait_ms: float):
+        self._run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._worker = None
+        self.batches = 0
+        self.sequences = 0
+        self.queue_wait_seconds = 0.0
+
+    def submit(self, sequence: List[int]) -> Future:
+        """Queues one token sequence; the Future resolves to its class probabilities."""
+        request = _Request(sequence)
+        with self._cond:
+            # Started lazily so no thread exists before the server forks workers
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._loop, name="inference-scheduler", daemon=True)
+                self._worker.start()
+            self._queue.append(request)
+            self._cond.notify()
+        return request.future
+
+    def _next_batch(self) -> List[_Request]:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            # Wait for a full batch, but never longer than max_wait past the oldest request
+            deadline = self._queue[0].enqueued + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(self.max_batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _loop(self) -> None:
+        while True:
+            # Callers may have cancelled requests they no longer need
+            batch = [request for request in self._next_batch() if request.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.monotonic()
+            try:
+                probabilities = self._run_batch([request.sequence for request in batch])
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            observe("inference", time.monotonic() - started)
+            increment("inference_batches")
+            increment("inference_sequences", len(batch))
+            self.batches += 1
+            self.sequences += len(batch)
+            self.queue_wait_seconds += sum(started - request.enqueued for request in batch)
+            for request, row in zip(batch, probabilities):
+                request.future.set_result(row)
+
+    def stats(self) -> dict:
+        with self._cond:
+            queued = len(self._queue)
+        return {
+            "queued": queued,
+            "batches": self.batches,
+            "sequences": self.sequences,
+            "mean_batch_size": round(self.sequences / self.batches, 2) if self.batches else 0.0,
+            "mean_queue_wait_ms": round(1000 * self.queue_wait_seconds / self.sequences, 2) if self.sequences else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
@@ -1,17 +1,56 @@
 # app/services/insights_service_spacy.py
 import os
 import re
-from huggingface_hub import snapshot_download
-import spacy
+from app.services.metrics_service import increment, timed
+from app.services.model_loader_service import OFFLINE, register_model
+from app.utils.cache_utils import LRUCache, content_hash
 
 # ----------------- Env Fix for Windows -----------------
 os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
 os.environ["HF_HUB_DISABLE_SYMLINKS"] = "1"
 
 # ----------------- Load Model -----------------
-# Download and load the spaCy NER model
-model_path = snapshot_download("amjad-awad/skill-extractor", repo_type="model")
-nlp = spacy.load(model_path)
+# The spaCy NER model is downloaded (or read from the local cache when offline)
+# and loaded on first use. HIRESENSE_SKILL_MODEL_PATH points at a local copy
+# and skips the hub entirely.
+SKILL_MODEL_REPO = "amjad-awad/skill-extractor"
+SKILL_MODEL_PATH = os.getenv("HIRESENSE_SKILL_MODEL_PATH")
+
+def _load_skill_extractor():
+    import spacy
+
+    model_path = SKILL_MODEL_PATH
+    if not model_path:
+        from huggingface_hub import snapshot_download
+        model_path = snapshot_download(SKILL_MODEL_REPO, repo_type="model", local_files_only=OFFLINE)
+    return spacy.load(model_path)
+
+skill_extractor = register_model("skill_extractor", _load_skill_extractor)
+
+def skill_model_identity() -> str:
+    """
+    Identifies the skill model by its source and the pipeline's name and
+    version, so cached skill breakdowns are never reused across models or
+    upgrades of one. Loads the model to read its meta.
+    """
+    if SKILL_MODEL_PATH and os.path.isdir(SKILL_MODEL_PATH):
+        from app.services.score_cache_service import model_fingerprint
+        source = f"{SKILL_MODEL_PATH}:{model_fingerprint(SKILL_MODEL_PATH)}"
+    else:
+        source = SKILL_MODEL_PATH or SKILL_MODEL_REPO
+    meta = skill_extractor.get().meta
+    return f"{source}:{meta.get('lang')}_{meta.get('name')}:{meta.get('version')}"
+
+# ----------------- Skill Cache -----------------
+# Extracted skill sets keyed by a hash of the cleaned text, so the JD (and any
+# resume seen before) is parsed by the NER pipeline only once.
+SKILL_CACHE_SIZE = int(os.getenv("HIRESENSE_SKILL_CACHE_SIZE", "4096"))
+skill_cache = LRUCache(SKILL_CACHE_SIZE)
+
+# ----------------- Bulk Extraction Settings -----------------
+# Documents per nlp.pipe batch and worker processes used for bulk extraction.
+NER_BATCH_SIZE = int(os.getenv("HIRESENSE_NER_BATCH_SIZE", "32"))
+NER_N_PROCESS = int(os.getenv("HIRESENSE_NER_N_PROCESS", "1"))
 
 # ----------------- Generic → Specific Skill Mapping -----------------
 GENERIC_SKILL_MAP = {
@@ -35,16 +74,62 @@ def clean_text(text: str) -> str:
 def extract_skills(text: str) -> list:
     """
     Extract skills from text using spaCy NER model.
+    Results are cached by content hash, so repeated texts skip the model.
     """
     text = clean_text(text)
-    doc = nlp(text)
+    key = content_hash(text)
+    skills = skill_cache.get(key)
+    if skills is None:
+        with timed("ner"):
+            skills = _skills_from_doc(skill_extractor.get()(text))
+        increment("ner_documents")
+        skill_cache.put(key, skills)
+    return list(skills)
+
+def extract_skills_many(texts: list, batch_size: int = NER_BATCH_SIZE, n_process: int = NER_N_PROCESS) -> list:
+    """
+    Extract skills from many texts at once, streaming the cache misses through
+    nlp.pipe. Returns one skill list per input text, in input order.
+    """
+    cleaned = [clean_text(text) for text in texts]
+    keys = [content_hash(text) for text in cleaned]
+
+    found = {}
+    pending = {}  # Deduplicated cache misses: key -> cleaned text
+    for key, text in zip(keys, cleaned):
+        if key in found or key in pending:
+            continue
+        skills = skill_cache.get(key)
+        if skills is None:
+            pending[key] = text
+        else:
+            found[key] = skills
+
+    if pending:
+        # Worker processes only pay off when there is more than one batch of work
+        workers = n_process if len(pending) > batch_size else 1
+        with timed("ner"):
+            docs = skill_extractor.get().pipe(pending.values(), batch_size=batch_size, n_process=workers)
+            for key, doc in zip(pending.keys(), docs):
+                skills = _skills_from_doc(doc)
+                skill_cache.put(key, skills)
+                found[key] = skills
+        increment("ner_documents", len(pending))
+
+    return [list(found[key]) for key in keys]
+
+def _skills_from_doc(doc) -> frozenset:
     skills = [
         ent.text.strip().lower()
         for ent in doc.ents
         if "SKILLS" in ent.label_
     ]
     # Deduplicate + remove noise
-    return list(set(skill for skill in skills if skill not in NOISE_TERMS))
+    return frozenset(skill for skill in skills if skill not in NOISE_TERMS)
+
+def get_skill_cache_stats() -> dict:
+    """Returns hit/miss counters for the skill extraction cache."""
+    return skill_cache.stats()
 
 # ----------------- Expand Generic Skills -----------------
 def expand_with_generic_matches(jd_skills, resume_skills):
@@ -72,7 +157,18 @@ def get_skill_matches(jd_text: str, resume_text: str):
     """
     jd_skills = set(extract_skills(jd_text))
     resume_skills = set(extract_skills(resume_text))
+    return _build_skill_breakdown(jd_skills, resume_skills)
+
+def get_skill_matches_many(jd_text: str, resume_texts: list) -> list:
+    """
+    Compare the JD against many resumes with a single bulk extraction pass.
+    Returns one breakdown per resume, in input order.
+    """
+    skill_lists = extract_skills_many([jd_text, *resume_texts])
+    jd_skills = set(skill_lists[0])
+    return [_build_skill_breakdown(jd_skills, set(skills)) for skills in skill_lists[1:]]
 
+def _build_skill_breakdown(jd_skills: set, resume_skills: set) -> dict:
     matched_skills, missing_skills = expand_with_generic_matches(jd_skills, resume_skills)
 
     return {
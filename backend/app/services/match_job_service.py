@@ -0,0 +1,411 @@
+# app/services/match_job_service.py
+
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from app.services.match_service import MatchCancelled, is_scored, match_session
+from app.services.session_service import SESSION_DB_PATH, SESSION_STORE, Session, session_store
+
+# ----------------- Configuration -----------------
+# Match jobs scored at the same time; the rest wait in the queue
+MATCH_JOB_WORKERS = int(os.getenv("HIRESENSE_MATCH_JOB_WORKERS", "2"))
+# Queued plus running jobs accepted before new submissions are refused
+MATCH_JOB_MAX_PENDING = int(os.getenv("HIRESENSE_MATCH_JOB_MAX_PENDING", "16"))
+# Finished jobs are kept this long for status polling
+MATCH_JOB_TTL_SECONDS = int(os.getenv("HIRESENSE_MATCH_JOB_TTL_SECONDS", "3600"))
+# Resumes included in the partial ranking of progress updates
+PARTIAL_RANKING_SIZE = int(os.getenv("HIRESENSE_PARTIAL_RANKING_SIZE", "20"))
+# Scores written by a running job are saved to the session store at most this often (seconds)
+MATCH_JOB_SAVE_INTERVAL = float(os.getenv("HIRESENSE_MATCH_JOB_SAVE_INTERVAL", "1"))
+
+ACTIVE_STATES = ("queued", "running")
+
+
+class JobQueueFull(Exception):
+    """Raised when too many match jobs are queued or running."""
+
+
+class JobConflict(Exception):
+    """Raised when the session already has an active match job or synchronous match."""
+
+    def __init__(self, session_id: str, job_id: Optional[str] = None):
+        active = f"match job ({job_id})" if job_id else "synchronous match"
+        super().__init__(f"Session '{session_id}' already has an active {active}.")
+        self.job_id = job_id
+
+
+def summarize_resume(resume: dict) -> dict:
+    """Ranking entry without the resume text."""
+    return {
+        "filename": resume["filename"],
+        "score": resume.get("score"),
+        "prediction": resume.get("prediction"),
+        "score_source": resume.get("score_source"),
+        "matched_skills": resume.get("matched_skills", []),
+        "missing_skills": resume.get("missing_skills", []),
+    }
+
+
+class MatchJob:
+    """State of one asynchronous match over a session's resumes."""
+
+    def __init__(self, session: Session, mode: str, top_k: Optional[int], min_similarity: Optional[float],
+                 registry: Optional["JobRegistry"] = None):
+        self.id = uuid.uuid4().hex
+        self.session = session
+        self.mode = mode
+        self.top_k = top_k
+        self.min_similarity = min_similarity
+        self.status = "queued"
+        self.scored = 0
+        self.total = len(session.resumes)
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Bumped on every change so progress streams know when to send an update
+        self.version = 0
+        self.cancel_event = threading.Event()
+        self.future = None
+        # Run by another worker process; state is read from the registry
+        self.remote = False
+        self._registry = registry
+        self._saved_at = 0.0
+
+    @classmethod
+    def from_row(cls, row: dict, session: Session) -> "MatchJob":
+        """A job another worker runs, as last published to the registry."""
+        job = cls(session, row["mode"], None, None)
+        for key in ("id", "status", "scored", "total", "error", "created_at", "started_at", "finished_at", "version"):
+            setattr(job, key, row[key])
+        job.remote = True
+        return job
+
+    def _touch(self, **changes) -> None:
+        for key, value in changes.items():
+            setattr(self, key, value)
+        self.version += 1
+
+    def _publish(self) -> None:
+        """Shares the job's state with other workers and picks up cancellations made there."""
+        if self._registry is not None and self._registry.publish(self):
+            self.cancel_event.set()
+
+    def _on_progress(self, scored: int, total: int) -> None:
+        self._touch(scored=scored, total=total)
+        now = time.monotonic()
+        if now - self._saved_at >= MATCH_JOB_SAVE_INTERVAL:
+            # Only the records rescored since the last save are written, and
+            # changes other requests saved meanwhile are merged first
+            session_store.save(self.session)
+            self._publish()
+            self._saved_at = now
+
+    def run(self) -> None:
+        self._publish()
+        if self.cancel_event.is_set():
+            self._touch(status="cancelled", finished_at=time.time())
+            self._publish()
+            return
+        self._touch(status="running", started_at=time.time())
+        try:
+            match_session(self.session, self.mode, self.top_k, self.min_similarity,
+                          on_progress=self._on_progress, cancel_event=self.cancel_event)
+            status, error = "completed", None
+        except MatchCancelled:
+            status, error = "cancelled", None
+        except Exception as e:
+            print(f"Match job {self.id} failed: {e}")
+            status, error = "failed", str(e)
+        # Scores written since the last progress save
+        session_store.save(self.session)
+        self._touch(status=status, error=error, finished_at=time.time())
+        self._publish()
+
+    @property
+    def finished(self) -> bool:
+        return self.status not in ACTIVE_STATES
+
+    def ranking(self, limit: Optional[int] = PARTIAL_RANKING_SIZE) -> List[dict]:
+        """Best resumes scored for the session's current JD so far."""
+        jd = self.session.jd
+        if not jd:
+            return []
+        ranked = []
+        for resume in self.session.resumes.ranked():
+            if is_scored(resume, jd["hash"]):
+                ranked.append(summarize_resume(resume))
+                if limit and len(ranked) == limit:
+                    break
+        return ranked
+
+    def describe(self, ranking_limit: Optional[int] = PARTIAL_RANKING_SIZE) -> dict:
+        return {
+            "job_id": self.id,
+            "session_id": self.session.id,
+            "mode": self.mode,
+            "status": self.status,
+            "scored": self.scored,
+            "total": self.total,
+            "progress": round(self.scored / self.total, 4) if self.total else 1.0,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "ranked_resumes": self.ranking(ranking_limit),
+        }
+
+
+class JobRegistry:
+    """
+    Shares match job state between worker processes through the session
+    database. Every job and synchronous match is a row tagged with the pid of
+    the worker running it, so any worker can report on a job, cancel it, or
+    refuse a second match of the same session. Running jobs publish their
+    progress at most once per MATCH_JOB_SAVE_INTERVAL and pick up
+    cancellations requested elsewhere at the same time.
+    """
+
+    _JOB_FIELDS = ("status", "scored", "total", "error", "started_at", "finished_at", "version")
+
+    def __init__(self, path: str = SESSION_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connect()
+        if hasattr(os, "register_at_fork"):
+            # SQLite connections must not be shared with forked worker processes
+            os.register_at_fork(after_in_child=self._connect)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS match_jobs (
+                id TEXT PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                mode TEXT,
+                status TEXT NOT NULL,
+                scored INTEGER NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                version INTEGER NOT NULL DEFAULT 0,
+                pid INTEGER NOT NULL,
+                cancel_requested INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_match_jobs_session ON match_jobs (session_id, status);
+            """
+        )
+
+    def _connect(self) -> None:
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+
+    def claim(self, session_id: str, row_id: str, kind: str, mode: Optional[str], total: int,
+              is_local: Callable[[str], bool]) -> None:
+        """
+        Records a new job or synchronous match of the session, or raises
+        JobConflict if a live worker is already matching it. Rows left behind
+        by workers that exited are closed on the way. is_local(row_id) tells
+        whether a row owned by this process is still active here.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                active = self._conn.execute(
+                    "SELECT id, kind, pid FROM match_jobs WHERE session_id = ? AND status IN (?, ?)",
+                    (session_id, *ACTIVE_STATES),
+                ).fetchall()
+                for row in active:
+                    if self._alive(row, is_local):
+                        raise JobConflict(session_id, row["id"] if row["kind"] == "job" else None)
+                self._conn.execute(
+                    "INSERT INTO match_jobs (id, session_id, kind, mode, status, total, created_at, pid) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (row_id, session_id, kind, mode, "queued" if kind == "job" else "running", total,
+                     time.time(), os.getpid()),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _alive(self, row, is_local: Callable[[str], bool]) -> bool:
+        """Whether the worker running an active row is still at it; closes the row if not. Call with the lock held."""
+        alive = is_local(row["id"]) if row["pid"] == os.getpid() else _process_alive(row["pid"])
+        if not alive:
+            self._conn.execute(
+                "UPDATE match_jobs SET status = 'failed', error = ?, finished_at = ?, version = version + 1 "
+                "WHERE id = ?", ("Worker exited before the match finished.", time.time(), row["id"]),
+            )
+        return alive
+
+    def publish(self, job: MatchJob) -> bool:
+        """Writes the job's state; returns True if another worker asked to cancel it."""
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE match_jobs SET {', '.join(f'{key} = ?' for key in self._JOB_FIELDS)} WHERE id = ?",
+                (*(getattr(job, key) for key in self._JOB_FIELDS), job.id),
+            )
+            row = self._conn.execute("SELECT cancel_requested FROM match_jobs WHERE id = ?", (job.id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def get(self, job_id: str, is_local: Callable[[str], bool]) -> Optional[dict]:
+        with self._lock:
+            query = "SELECT * FROM match_jobs WHERE id = ? AND kind = 'job'"
+            row = self._conn.execute(query, (job_id,)).fetchone()
+            if row is not None and row["status"] in ACTIVE_STATES and not self._alive(row, is_local):
+                row = self._conn.execute(query, (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def request_cancel(self, job_id: str) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE match_jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+
+    def release(self, row_id: str) -> None:
+        """Removes the row of a finished synchronous match."""
+        with self._lock:
+            self._conn.execute("DELETE FROM match_jobs WHERE id = ?", (row_id,))
+
+    def prune(self, cutoff: float) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM match_jobs WHERE finished_at < ?", (cutoff,))
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Exists, owned by another user
+    return True
+
+
+class MatchJobManager:
+    """
+    Runs match jobs on a bounded thread pool and tracks their state. With a
+    registry (sessions in SQLite), job state is shared with the other worker
+    processes, so requests about a job can reach any of them.
+    """
+
+    def __init__(self, workers: int = MATCH_JOB_WORKERS, max_pending: int = MATCH_JOB_MAX_PENDING,
+                 ttl_seconds: int = MATCH_JOB_TTL_SECONDS, registry: Optional[JobRegistry] = None):
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.registry = registry
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="match-job")
+        self._jobs: Dict[str, MatchJob] = {}
+        # Sessions with a synchronous /match/ in progress, and the ID of its registry row
+        self._sync_matches: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, session: Session, mode: str = "full", top_k: Optional[int] = None,
+               min_similarity: Optional[float] = None) -> MatchJob:
+        with self._lock:
+            self._prune()
+            self._check_idle(session.id)
+            active = [job for job in self._jobs.values() if not job.finished]
+            if len(active) >= self.max_pending:
+                raise JobQueueFull(f"{len(active)} match jobs are already queued or running.")
+            job = MatchJob(session, mode, top_k, min_similarity, self.registry)
+            if self.registry is not None:
+                self.registry.claim(session.id, job.id, "job", mode, job.total, self._is_local)
+            self._jobs[job.id] = job
+            job.future = self._executor.submit(job.run)
+        return job
+
+    @contextmanager
+    def exclusive_match(self, session_id: str) -> Iterator[None]:
+        """
+        Marks a synchronous match of the session for the duration of the block,
+        so it never runs alongside a match job (or another match) of the same
+        session, in this process or another worker.
+        """
+        row_id = uuid.uuid4().hex
+        with self._lock:
+            self._check_idle(session_id)
+            if self.registry is not None:
+                self.registry.claim(session_id, row_id, "sync", None, 0, self._is_local)
+            self._sync_matches[session_id] = row_id
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._sync_matches.pop(session_id, None)
+            if self.registry is not None:
+                self.registry.release(row_id)
+
+    def _check_idle(self, session_id: str) -> None:
+        """Raises JobConflict if the session is being matched in this process. Call with the lock held."""
+        if session_id in self._sync_matches:
+            raise JobConflict(session_id)
+        for job in self._jobs.values():
+            if not job.finished and job.session.id == session_id:
+                raise JobConflict(session_id, job.id)
+
+    def _is_local(self, row_id: str) -> bool:
+        """True if the registry row belongs to a job or synchronous match still active in this process."""
+        job = self._jobs.get(row_id)
+        return (job is not None and not job.finished) or row_id in self._sync_matches.values()
+
+    def get(self, job_id: str, session: Session) -> Optional[MatchJob]:
+        """
+        The job if it belongs to the session. Jobs run by other workers are
+        read from the registry, with their ranking taken from `session`.
+        """
+        job = self._jobs.get(job_id)
+        if job is None and self.registry is not None:
+            row = self.registry.get(job_id, self._is_local)
+            if row is not None and row["session_id"] == session.id:
+                return MatchJob.from_row(row, session)
+        return job if job is not None and job.session.id == session.id else None
+
+    def refresh(self, job: MatchJob) -> MatchJob:
+        """Latest state of a job run by another worker, with the scores it saved since. Blocking."""
+        if not job.remote:
+            return job
+        row = self.registry.get(job.id, self._is_local)
+        if row is None:
+            return job
+        return MatchJob.from_row(row, session_store.load(job.session.id))
+
+    def cancel(self, job: MatchJob) -> MatchJob:
+        """
+        Cancels a queued job outright; a running job stops before its next
+        micro-batch. Jobs of other workers stop once they next publish progress.
+        """
+        if job.finished:
+            return job
+        if job.remote:
+            self.registry.request_cancel(job.id)
+            return job
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            job._touch(status="cancelled", finished_at=time.time())
+            job._publish()
+        return job
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+        if self.registry is not None:
+            self.registry.prune(cutoff)
+
+    def stats(self) -> dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"jobs": counts, "max_pending": self.max_pending}
+
+
+match_jobs = MatchJobManager(registry=JobRegistry() if SESSION_STORE == "sqlite" else None)
@@ -0,0 +1,109 @@
+# app/services/match_service.py
+
+import threading
+from typing import Callable, Optional
+
+from app.services.metrics_service import timed
+from app.services.prediction_service import prediction_service
+from app.services.retrieval_service import shortlist_by_similarity
+from app.services.session_service import Session
+
+MATCH_MODES = ("full", "two_stage")
+
+
+class MatchCancelled(Exception):
+    """Raised inside a match when its cancel event is set."""
+
+
+def apply_prediction(resume: dict, pred: dict, jd_hash: str) -> None:
+    """
+    Writes a prediction (hybrid score, label and skill breakdown) onto a resume
+    record so /analytics and the report exports can reuse it.
+    """
+    # Hybrid fit score from ML + skill insights
+    hybrid_score = pred.get("hybrid_fit_score", pred["fit_probability"]) * 100
+    skill_breakdown = pred["skill_breakdown"]
+
+    resume["score"] = round(hybrid_score, 2)
+    resume["prediction"] = pred.get("prediction", "Fit")
+    resume["matched_skills"] = skill_breakdown["matched_skills"]
+    resume["missing_skills"] = skill_breakdown["missing_skills"]
+    resume["score_source"] = "model"
+    # Remember which JD produced the score so stale scores are never reused
+    resume["scored_jd"] = jd_hash
+
+
+def apply_embedding_score(resume: dict, similarity: float, jd_hash: str) -> None:
+    """
+    Writes an embedding-only score for a resume that two-stage matching did not
+    send to the classifier. No skill breakdown is computed for these.
+    """
+    resume["score"] = round(max(similarity, 0.0) * 100, 2)
+    resume["prediction"] = "Embedding Only"
+    resume.pop("matched_skills", None)
+    resume.pop("missing_skills", None)
+    resume["score_source"] = "embedding"
+    resume["scored_jd"] = jd_hash
+
+
+def is_scored(resume: dict, jd_hash: str) -> bool:
+    """True if the resume already holds a score for the JD with this content hash (session.jd["hash"])."""
+    return "score" in resume and resume.get("scored_jd") == jd_hash
+
+
+def match_session(session: Session, mode: str = "full", top_k: Optional[int] = None,
+                  min_similarity: Optional[float] = None,
+                  on_progress: Optional[Callable[[int, int], None]] = None,
+                  cancel_event: Optional[threading.Event] = None) -> None:
+    """
+    Scores the session's resumes against its JD and writes the results onto the
+    records (blocking; run it off the event loop). In two_stage mode only the
+    resumes closest to the JD by embedding similarity go through the classifier.
+    on_progress(scored, total) is called as resumes finish; setting cancel_event
+    stops the match before the next micro-batch with MatchCancelled.
+    """
+    jd_content = session.jd["content"]
+    jd_hash = session.jd["hash"]
+    resumes = session.resumes.to_list()
+    resume_contents = [resume["content"] for resume in resumes]
+
+    def still_in_session(resume: dict) -> bool:
+        # Accepted/rejected (or replaced) while the match was running
+        return session.resumes.get(resume["filename"]) is resume
+
+    if mode == "two_stage":
+        # Stage one: vectorized bi-encoder ranking of the whole pool
+        with timed("retrieval"):
+            selected, similarities = shortlist_by_similarity(resume_contents, jd_content, top_k, min_similarity)
+        shortlisted = set(selected)
+        for idx, resume in enumerate(resumes):
+            if idx in shortlisted:
+                continue
+            with session.resumes.lock:
+                if still_in_session(resume):
+                    apply_embedding_score(resume, float(similarities[idx]), jd_hash)
+                    session.resumes.reposition(resume["filename"])
+    else:
+        selected = list(range(len(resumes)))
+
+    total = len(selected)
+    if on_progress:
+        on_progress(0, total)
+
+    # Hybrid predictions stream back as each resume's micro-batch completes
+    results = prediction_service.iter_predict_batch([resume_contents[i] for i in selected], jd_content)
+    try:
+        for scored, (position, pred) in enumerate(results, start=1):
+            resume = resumes[selected[position]]
+            # Checked and written under the lock, so a concurrent reject can't slip in between
+            with session.resumes.lock:
+                if still_in_session(resume):
+                    apply_prediction(resume, pred, jd_hash)
+                    session.resumes.reposition(resume["filename"])
+            if on_progress:
+                on_progress(scored, total)
+            if cancel_event is not None and cancel_event.is_set():
+                raise MatchCancelled()
+    finally:
+        # Stops the remaining micro-batches
+        results.close()
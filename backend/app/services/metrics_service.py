@@ -0,0 +1,299 @@
+# app/services/metrics_service.py
+
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# ----------------- Configuration -----------------
+# Stage timers, counters and the Server-Timing header; cheap enough to leave on
+METRICS_ENABLED = os.getenv("HIRESENSE_METRICS", "1") == "1"
+METRIC_PREFIX = "hiresense"
+# Upper bounds (seconds) of the stage duration histogram buckets
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Set by run.py with several workers: each process writes a snapshot of its
+# metrics here and /metrics sums them, whichever worker serves the scrape
+METRICS_DIR = os.getenv("HIRESENSE_METRICS_DIR")
+SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("HIRESENSE_METRICS_SNAPSHOT_SECONDS", "5"))
+# Cache statistics that are summed across processes
+CACHE_FIELDS = ("hits", "misses", "size", "entries")
+
+
+class _StageHistogram:
+    __slots__ = ("buckets", "count", "total")
+
+    def __init__(self):
+        self.buckets = [0] * (len(STAGE_BUCKETS) + 1)  # Last one is +Inf
+        self.count = 0
+        self.total = 0.0
+
+
+_lock = threading.Lock()
+_stages: Dict[str, _StageHistogram] = {}
+_counters: Dict[str, float] = {}
+
+# (stage, seconds) entries of the request being served, if any
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+# ----------------- Recording -----------------
+def observe(stage: str, seconds: float) -> None:
+    """Records time spent in a stage, globally and for the current request."""
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        histogram = _stages.get(stage)
+        if histogram is None:
+            histogram = _stages[stage] = _StageHistogram()
+        histogram.buckets[bisect_left(STAGE_BUCKETS, seconds)] += 1
+        histogram.count += 1
+        histogram.total += seconds
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))  # list.append is atomic, threads may share it
+
+
+def increment(name: str, amount: float = 1) -> None:
+    """Adds to a monotonically increasing counter."""
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Times the enclosed block as one observation of `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def timed_iter(stage: str, chunks: Iterable) -> Iterator:
+    """
+    Passes a streamed body through, recording the time spent producing it as
+    one observation. Time the consumer spends sending each chunk is excluded.
+    """
+    elapsed = 0.0
+    iterator = iter(chunks)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield chunk
+    finally:
+        observe(stage, elapsed)
+
+
+# ----------------- Server-Timing -----------------
+def start_request_timing() -> List[Tuple[str, float]]:
+    """Collects the stages observed while the current request is handled."""
+    timings = []
+    _request_timings.set(timings)
+    return timings
+
+
+def format_server_timing(timings: List[Tuple[str, float]], total_seconds: float) -> str:
+    """Server-Timing header value: per-stage totals and the whole request, in ms."""
+    totals: Dict[str, float] = {}
+    for stage, seconds in list(timings):
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items()]
+    entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that adds a Server-Timing header with the stages observed
+    (in threads too) while the request was handled. Plain ASGI, so streamed
+    responses pass through untouched. Stages that run while a body is streamed
+    come after the headers and only reach /metrics.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = start_request_timing()
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                value = format_server_timing(timings, time.perf_counter() - start)
+                headers = [*message.get("headers", ()), (b"server-timing", value.encode("latin-1"))]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
+
+
+# ----------------- Snapshots -----------------
+def snapshot(caches: Optional[Dict[str, dict]] = None, gauges: Optional[Dict[str, float]] = None) -> dict:
+    """
+    This process's stage histograms and counters, plus the given cache
+    statistics (as returned by the caches' stats()) and gauges.
+    """
+    with _lock:
+        stages = {stage: [list(h.buckets), h.count, h.total] for stage, h in _stages.items()}
+        counters = dict(_counters)
+    return {
+        "pid": os.getpid(),
+        "stages": stages,
+        "counters": counters,
+        "caches": {cache: {field: stats[field] for field in CACHE_FIELDS if field in stats}
+                   for cache, stats in (caches or {}).items()},
+        "gauges": dict(gauges or {}),
+    }
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"metrics-{pid}.json")
+
+
+def write_snapshot(metrics: dict) -> None:
+    path = _snapshot_path(metrics["pid"])
+    with open(path + ".tmp", "w") as f:
+        json.dump(metrics, f)
+    os.replace(path + ".tmp", path)  # Readers never see a half-written file
+
+
+_writer_pid = None
+
+
+def start_snapshot_writer(collect: Callable[[], dict]) -> None:
+    """
+    With METRICS_DIR set, writes collect()'s snapshot every
+    SNAPSHOT_INTERVAL_SECONDS from a daemon thread, so workers that never
+    serve /metrics are still counted. Call once per worker process.
+    """
+    global _writer_pid
+    if not (METRICS_ENABLED and METRICS_DIR) or _writer_pid == os.getpid():
+        return
+    _writer_pid = os.getpid()
+
+    def loop():
+        while True:
+            time.sleep(SNAPSHOT_INTERVAL_SECONDS)
+            try:
+                write_snapshot(collect())
+            except Exception as e:
+                print(f"Could not write the metrics snapshot: {e}")
+
+    threading.Thread(target=loop, name="metrics-snapshot", daemon=True).start()
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def aggregate_workers(metrics: dict) -> dict:
+    """
+    Sums this process's snapshot with the latest ones of the other workers.
+    Histograms, counters and cache hits/misses of workers that exited are
+    kept, so totals never go backwards; their gauges and cache sizes are
+    dropped. Returns `metrics` unchanged without METRICS_DIR.
+    """
+    if not METRICS_DIR:
+        return metrics
+    write_snapshot(metrics)
+    snapshots = []
+    for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.json")):
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # Removed or replaced meanwhile
+
+    total = {"pid": metrics["pid"], "stages": {}, "counters": {}, "caches": {}, "gauges": {}}
+    workers = 0
+    for other in snapshots:
+        alive = other["pid"] == metrics["pid"] or _alive(other["pid"])
+        workers += alive
+        for stage, (buckets, count, seconds) in other["stages"].items():
+            into = total["stages"].setdefault(stage, [[0] * len(buckets), 0, 0.0])
+            into[0] = [a + b for a, b in zip(into[0], buckets)]
+            into[1] += count
+            into[2] += seconds
+        for counter, value in other["counters"].items():
+            total["counters"][counter] = total["counters"].get(counter, 0) + value
+        for cache, stats in other["caches"].items():
+            into = total["caches"].setdefault(cache, {})
+            for field, value in stats.items():
+                if alive or field in ("hits", "misses"):
+                    into[field] = into.get(field, 0) + value
+        if alive:
+            for gauge, value in other["gauges"].items():
+                total["gauges"][gauge] = total["gauges"].get(gauge, 0) + value
+    total["gauges"]["workers"] = workers
+    return total
+
+
+# ----------------- Prometheus exposition -----------------
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(metrics: dict, gauges: Optional[Dict[str, float]] = None) -> str:
+    """
+    Renders a snapshot (this process's, or the sum over workers) in the
+    Prometheus text format, with extra gauges that are the same in every
+    worker (e.g. read from shared storage).
+    """
+    stages, counters, caches = metrics["stages"], metrics["counters"], metrics["caches"]
+    gauges = {**metrics["gauges"], **(gauges or {})}
+
+    name = f"{METRIC_PREFIX}_stage_seconds"
+    lines = [f"# HELP {name} Time spent in each processing stage.", f"# TYPE {name} histogram"]
+    for stage, (buckets, count, total) in sorted(stages.items()):
+        cumulative = 0
+        for bound, bucket_count in zip(STAGE_BUCKETS + ("+Inf",), buckets):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{stage="{stage}"}} {total!r}')
+        lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+
+    for counter, value in sorted(counters.items()):
+        name = f"{METRIC_PREFIX}_{counter}_total"
+        lines += [f"# TYPE {name} counter", f"{name} {_number(value)}"]
+
+    if caches:
+        # In-memory caches report "size", the persistent score cache "entries"
+        fields = (("hits", "hits_total", "counter"), ("misses", "misses_total", "counter"),
+                  ("size", "entries", "gauge"), ("entries", "entries", "gauge"))
+        samples: Dict[Tuple[str, str], List[str]] = {}
+        for field, metric, kind in fields:
+            for cache, stats in caches.items():
+                if field in stats:
+                    name = f"{METRIC_PREFIX}_cache_{metric}"
+                    samples.setdefault((name, kind), []).append(f'{name}{{cache="{cache}"}} {_number(stats[field])}')
+        for (name, kind), metric_lines in samples.items():
+            lines.append(f"# TYPE {name} {kind}")
+            lines += metric_lines
+
+    for gauge, value in sorted(gauges.items()):
+        name = f"{METRIC_PREFIX}_{gauge}"
+        lines += [f"# TYPE {name} gauge", f"{name} {_number(value)}"]
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,103 @@
+# app/services/model_loader_service.py
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable
+
+# ----------------- Offline Mode -----------------
+# With HIRESENSE_OFFLINE=1 every model is loaded from the local cache (or an
+# explicit local path) and the Hugging Face Hub is never contacted.
+OFFLINE = os.getenv("HIRESENSE_OFFLINE", "0") == "1"
+if OFFLINE:
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+# Start loading every registered model in the background when the app starts
+WARM_ON_STARTUP = os.getenv("HIRESENSE_WARM_ON_STARTUP", "1") == "1"
+
+
+class LazyModel:
+    """
+    Loads a model on first use (or when warmed in the background) and records
+    its load state and duration. Concurrent callers share a single load.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any]):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self.state = "not_loaded"
+        self.load_seconds = None
+        self.error = None
+
+    def get(self) -> Any:
+        if self.state == "ready":
+            return self._value
+        with self._lock:
+            if self.state != "ready":
+                self._load()
+            return self._value
+
+    def _load(self) -> None:
+        self.state = "loading"
+        self.error = None
+        start = time.perf_counter()
+        try:
+            self._value = self._loader()
+        except Exception as e:
+            # A later call retries, e.g. once the model files are in place
+            self.state = "failed"
+            self.error = str(e)
+            print(f"Error loading {self.name} model: {e}")
+            raise RuntimeError(f"The {self.name} model is not available: {e}") from e
+        self.load_seconds = round(time.perf_counter() - start, 3)
+        self.state = "ready"
+        print(f"{self.name} model loaded in {self.load_seconds}s.")
+
+    def warm_in_background(self) -> None:
+        """Starts loading in a daemon thread unless already loaded or loading."""
+        if self.state in ("ready", "loading"):
+            return
+        threading.Thread(target=self._warm, name=f"warm-{self.name}", daemon=True).start()
+
+    def _warm(self) -> None:
+        try:
+            self.get()
+        except RuntimeError:
+            pass  # Already recorded in state/error
+
+    def status(self) -> dict:
+        return {"state": self.state, "load_seconds": self.load_seconds, "error": self.error}
+
+
+_registry: Dict[str, LazyModel] = {}
+
+
+def register_model(name: str, loader: Callable[[], Any]) -> LazyModel:
+    """Registers a lazily loaded model under a name for readiness reporting."""
+    model = LazyModel(name, loader)
+    _registry[name] = model
+    return model
+
+
+def warm_all_in_background() -> None:
+    for model in _registry.values():
+        model.warm_in_background()
+
+
+def load_all(exclude: Iterable[str] = ()) -> None:
+    """Loads every registered model in the calling thread, except the ones named in `exclude`."""
+    skipped = set(exclude)
+    for name, model in _registry.items():
+        if name not in skipped:
+            model.get()
+
+
+def models_status() -> Dict[str, dict]:
+    return {name: model.status() for name, model in _registry.items()}
+
+
+def all_ready() -> bool:
+    return all(model.state == "ready" for model in _registry.values())
@@ -1,41 +1,174 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import contextvars
 import os
-from typing import List
+import threading
+import numpy as np
+from collections import deque
+from concurrent.futures import Future
+from typing import Iterator, List, Tuple
 
 # Import updated skill matching
-from app.services.insights_service import get_skill_matches, extract_skills, clean_text
+from app.services.insights_service import (
+    NER_BATCH_SIZE, NER_N_PROCESS, get_skill_matches, get_skill_matches_many, extract_skills, clean_text,
+    skill_model_identity
+)
+
+from app.services.score_cache_service import score_cache, model_fingerprint
+from app.services.model_loader_service import OFFLINE, register_model
+from app.services.inference_scheduler_service import InferenceScheduler
+from app.services.metrics_service import increment, timed
+from app.utils.cache_utils import LRUCache, content_hash
 
 # --- DEFINITIVE CONFIGURATION ---
-MODEL_FOLDER_NAME = "hiresense_hybrid_model"
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+# Model location and backend selection live with the inference backends
+from app.services.inference_backend_service import (
+    MODEL_FOLDER_NAME, MODEL_PATH, INFERENCE_BACKEND, load_backend
+)
+
+# --- Inference settings ---
+MAX_LENGTH = 512
+# Number of (resume, JD) pairs per forward pass; bounds peak memory for large pools
+PREDICT_BATCH_SIZE = int(os.getenv("HIRESENSE_PREDICT_BATCH_SIZE", "16"))
+# How long the scheduler waits for concurrent requests to fill a forward pass
+BATCH_MAX_WAIT_MS = float(os.getenv("HIRESENSE_BATCH_MAX_WAIT_MS", "5"))
+LABEL_MAP = {0: "No Fit", 1: "Fit"}
+
+# --- Long resume handling ---
+# truncate : one (resume, JD) pair per resume, cut at MAX_LENGTH tokens
+# chunked  : overlapping resume windows, each paired with the same JD slice
+SCORING_MODE = os.getenv("HIRESENSE_SCORING_MODE", "truncate")
+# How window probabilities are combined into one score: "max" or "mean"
+CHUNK_REDUCER = os.getenv("HIRESENSE_CHUNK_REDUCER", "max")
+# Tokens shared by consecutive resume windows
+CHUNK_OVERLAP = int(os.getenv("HIRESENSE_CHUNK_OVERLAP", "128"))
+# Token budget for the JD slice placed next to every window
+JD_MAX_TOKENS = int(os.getenv("HIRESENSE_JD_MAX_TOKENS", "192"))
 
-try:
-    SERVICE_FILE_DIR = os.path.dirname(os.path.abspath(__file__))
-    PROJECT_ROOT = os.path.abspath(os.path.join(SERVICE_FILE_DIR, "..", "..", ".."))
-    MODEL_PATH = os.path.join(PROJECT_ROOT, MODEL_FOLDER_NAME)
-except NameError:
-    MODEL_PATH = f"../{MODEL_FOLDER_NAME}"
+# --- Token cache ---
+# Token IDs (without special tokens) keyed by a hash of the text, so the JD and
+# every resume are tokenized once and reused across pairs, /match/ and reports
+TOKEN_CACHE_SIZE = int(os.getenv("HIRESENSE_TOKEN_CACHE_SIZE", "4096"))
+token_cache = LRUCache(TOKEN_CACHE_SIZE)
+
+# --- Skill extraction during batch prediction ---
+# Resumes per bulk NER pass: enough to fill nlp.pipe batches in every worker process
+NER_CHUNK_SIZE = NER_BATCH_SIZE * max(NER_N_PROCESS, 1)
 
 # --- Weights for hybrid score ---
 W_ML = 0.7
 W_SKILLS = 0.3
 
+def truncate_longest_first(first: np.ndarray, second: np.ndarray, budget: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cuts a pair of token sequences to `budget` tokens in total, the same way the
+    fast tokenizers' "longest_first" strategy does: the longer sequence is cut
+    down to what the shorter one leaves, and both are halved if that is not enough.
+    """
+    n1, n2 = len(first), len(second)
+    if n1 + n2 <= budget:
+        return first, second
+    swap = n1 > n2
+    if swap:
+        n1, n2 = n2, n1
+    n2 = n1 if n1 > budget else max(n1, budget - n1)
+    if n1 + n2 > budget:
+        n1 = budget // 2
+        n2 = n1 + budget % 2
+    if swap:
+        n1, n2 = n2, n1
+    return first[:n1], second[:n2]
+
+
+class _SkillPrefetch:
+    """
+    Extracts skills for resumes in the order their scores will complete, in
+    chunks of NER_CHUNK_SIZE on a background thread, so NER overlaps inference
+    and each bulk pass is large enough for nlp.pipe batching and n_process.
+    """
+
+    def __init__(self, jd_text: str, resume_texts: List[str], chunk_size: int = NER_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._chunks = [Future() for _ in range(0, len(resume_texts), chunk_size)]
+        self._stop = threading.Event()
+        # New threads start with an empty context; a copy keeps the NER time in the request's Server-Timing
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(self._run, jd_text, resume_texts),
+                         name="skill-prefetch", daemon=True).start()
+
+    def _run(self, jd_text: str, resume_texts: List[str]) -> None:
+        for number, future in enumerate(self._chunks):
+            if self._stop.is_set():
+                future.cancel()
+                continue
+            start = number * self.chunk_size
+            try:
+                future.set_result(get_skill_matches_many(jd_text, resume_texts[start:start + self.chunk_size]))
+            except Exception as e:
+                future.set_exception(e)
+
+    def get(self, position: int) -> dict:
+        """Skill breakdown of the resume at `position` in completion order."""
+        return self._chunks[position // self.chunk_size].result()[position % self.chunk_size]
+
+    def close(self) -> None:
+        """Skips the chunks not started yet."""
+        self._stop.set()
+
+
 class PredictionService:
-    def __init__(self, model_path: str = MODEL_PATH):
+    def __init__(self, model_path: str = MODEL_PATH, backend: str = INFERENCE_BACKEND,
+                 scoring_mode: str = SCORING_MODE, chunk_reducer: str = CHUNK_REDUCER):
+        if scoring_mode not in ("truncate", "chunked"):
+            raise ValueError(f"Unknown scoring mode '{scoring_mode}'. Expected 'truncate' or 'chunked'.")
+        if chunk_reducer not in ("max", "mean"):
+            raise ValueError(f"Unknown chunk reducer '{chunk_reducer}'. Expected 'max' or 'mean'.")
+        self.scoring_mode = scoring_mode
+        self.chunk_reducer = chunk_reducer
         self.model_path = model_path
+        self.backend_name = backend
+        self._fingerprint = None
+        # The backend and tokenizer are loaded on first use or by the startup warm-up
+        self._model = register_model("classifier", self._load)
+        # Pairs from all in-flight requests share forward passes, one at a time
+        self.scheduler = InferenceScheduler(self._predict_sequences, PREDICT_BATCH_SIZE, BATCH_MAX_WAIT_MS)
+
+    def _check_model_path(self) -> None:
         if not os.path.exists(self.model_path):
             raise FileNotFoundError(f"Model directory '{MODEL_FOLDER_NAME}' not found at '{self.model_path}'.")
-            
-        print(f"Loading model from {self.model_path} onto {DEVICE}...")
-        self.model = AutoModelForSequenceClassification.from_pretrained(self.model_path).to(DEVICE)
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
-        self.model.eval()
-        print("Model loaded successfully.")
-
-    def compute_hybrid_score(self, resume_text: str, jd_text: str, ml_prob: float) -> float:
+
+    def _load(self) -> tuple:
+        from transformers import AutoTokenizer
+
+        self._check_model_path()
+        print(f"Loading model from {self.model_path} with the '{self.backend_name}' backend...")
+        backend = load_backend(self.backend_name, self.model_path)
+        tokenizer = AutoTokenizer.from_pretrained(self.model_path, local_files_only=OFFLINE)
+        return backend, tokenizer
+
+    @property
+    def backend(self):
+        return self._model.get()[0]
+
+    @property
+    def tokenizer(self):
+        return self._model.get()[1]
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies cached scores produced by this checkpoint, skill model and configuration."""
+        # Computed from the files on disk, so fully cached requests never load the model
+        if self._fingerprint is None:
+            self._check_model_path()
+            # Cached entries include skill breakdowns, so the skill model is part of the key
+            settings = [self.backend_name, self.scoring_mode, MAX_LENGTH, skill_model_identity()]
+            if self.scoring_mode == "chunked":
+                settings += [self.chunk_reducer, CHUNK_OVERLAP, JD_MAX_TOKENS]
+            self._fingerprint = model_fingerprint(self.model_path, *settings)
+        return self._fingerprint
+
+    def compute_hybrid_score(self, resume_text: str, jd_text: str, ml_prob: float, skill_data: dict | None = None) -> float:
         """Compute hybrid Fit Score using ML probability + skill match %."""
-        skill_data = get_skill_matches(jd_text, resume_text)
+        if skill_data is None:
+            skill_data = get_skill_matches(jd_text, resume_text)
         jd_skills = skill_data["jd_skills"]
         matched_skills = skill_data["matched_skills"]
         if jd_skills:
@@ -47,60 +180,211 @@ class PredictionService:
 
     def predict(self, resume_text: str, jd_text: str) -> dict:
         """Handles a single prediction with hybrid Fit Score."""
-        inputs = self.tokenizer(
-            resume_text, jd_text, 
-            return_tensors="pt", padding="max_length", truncation=True, max_length=512
-        ).to(DEVICE)
-        
-        with torch.no_grad():
-            logits = self.model(**inputs).logits
-        
-        probabilities = torch.softmax(logits, dim=1).cpu().numpy()[0]
-        ml_prob = float(probabilities[1])
-        predicted_class_id = probabilities.argmax().item()
-        label_map = {0: "No Fit", 1: "Fit"}
-
-        # Compute hybrid score
-        hybrid_score = self.compute_hybrid_score(resume_text, jd_text, ml_prob)
+        result = self.predict_batch([resume_text], jd_text)[0]
 
         return {
-            "prediction": label_map[predicted_class_id],
-            "fit_probability": f"{ml_prob:.2%}",
-            "hybrid_fit_score": f"{hybrid_score:.2%}"
+            "prediction": result["prediction"],
+            "fit_probability": f"{result['fit_probability']:.2%}",
+            "hybrid_fit_score": f"{result['hybrid_fit_score']:.2%}"
         }
 
-    def predict_batch(self, resumes: List[str], jd_text: str) -> List[dict]:
-        """Batch prediction with hybrid Fit Score."""
-        if not resumes:
-            return []
-
-        jd_list = [jd_text] * len(resumes)
-        inputs = self.tokenizer(
-            resumes, jd_list, 
-            return_tensors="pt", padding=True, truncation=True, max_length=512
-        ).to(DEVICE)
-        
-        with torch.no_grad():
-            logits = self.model(**inputs).logits
-        
-        probabilities_batch = torch.softmax(logits, dim=1).cpu().numpy()
-        results = []
-        label_map = {0: "No Fit", 1: "Fit"}
-
-        for idx, probabilities in enumerate(probabilities_batch):
-            ml_prob = float(probabilities[1])
-            predicted_class_id = probabilities.argmax().item()
-            resume_text = resumes[idx]
-            hybrid_score = self.compute_hybrid_score(resume_text, jd_text, ml_prob)
-
-            results.append({
-                "prediction": label_map[predicted_class_id],
-                "fit_probability": ml_prob,
-                "hybrid_fit_score": hybrid_score
-            })
-            
+    def predict_batch(self, resumes: List[str], jd_text: str, batch_size: int | None = None) -> List[dict]:
+        """Batch prediction with hybrid Fit Score, returned in input order."""
+        results = [None] * len(resumes)
+        for idx, result in self.iter_predict_batch(resumes, jd_text, batch_size):
+            results[idx] = result
         return results
 
-print("Initializing Prediction Service...")
+    def iter_predict_batch(self, resumes: List[str], jd_text: str, batch_size: int | None = None) -> Iterator[Tuple[int, dict]]:
+        """
+        Streams (index, result) pairs as resumes finish scoring.
+        Sequences are sorted by token length so each micro-batch is padded only to
+        its own longest member, and peak memory is bounded by the micro-batch size.
+        """
+        if not resumes:
+            return
+        batch_size = batch_size or PREDICT_BATCH_SIZE
+
+        # Serve unchanged (JD, resume) pairs from the persistent score cache
+        jd_hash = content_hash(jd_text)
+        resume_hashes = [content_hash(resume) for resume in resumes]
+        cached = score_cache.get_many(self.fingerprint, jd_hash, resume_hashes) if score_cache else {}
+
+        pending = []
+        for idx, resume_hash in enumerate(resume_hashes):
+            if resume_hash in cached:
+                ml_prob, skill_data = cached[resume_hash]
+                yield idx, self._build_result(resumes[idx], jd_text, ml_prob, skill_data)
+            else:
+                pending.append(idx)
+        if not pending:
+            return
+
+        pending_texts = [resumes[i] for i in pending]
+        pending_hashes = [resume_hashes[i] for i in pending]
+        if self.scoring_mode == "chunked":
+            sequences, owners = self._encode_windows(pending_texts, jd_text, pending_hashes)
+        else:
+            sequences, owners = self._encode_pairs(pending_texts, jd_text, pending_hashes), list(range(len(pending_texts)))
+
+        # A resume is complete once all of its windows have been scored
+        remaining = [0] * len(pending_texts)
+        for owner in owners:
+            remaining[owner] += 1
+        window_probs = [[] for _ in pending_texts]
+
+        # Sequences run in a fixed order, so the order resumes complete in is known
+        # up front and NER can work through them ahead of inference
+        order = self._sequence_order(sequences)
+        completion_rank = {}
+        countdown = list(remaining)
+        for seq_idx in order:
+            owner = owners[seq_idx]
+            countdown[owner] -= 1
+            if countdown[owner] == 0:
+                completion_rank[owner] = len(completion_rank)
+        by_rank = sorted(completion_rank, key=completion_rank.get)
+        skills = _SkillPrefetch(jd_text, [pending_texts[owner] for owner in by_rank])
+
+        try:
+            for batch_indices, probabilities_batch in self._run_sequences(sequences, batch_size, order):
+                completed = []
+                for seq_idx, probabilities in zip(batch_indices, probabilities_batch):
+                    owner = owners[seq_idx]
+                    window_probs[owner].append(float(probabilities[1]))
+                    remaining[owner] -= 1
+                    if remaining[owner] == 0:
+                        completed.append(owner)
+                if not completed:
+                    continue
+
+                new_entries = []
+                for owner in completed:
+                    idx = pending[owner]
+                    skill_data = skills.get(completion_rank[owner])
+                    ml_prob = self._reduce(window_probs[owner])
+                    window_probs[owner] = None
+                    new_entries.append((resume_hashes[idx], ml_prob, skill_data))
+                    yield idx, self._build_result(resumes[idx], jd_text, ml_prob, skill_data)
+
+                if score_cache:
+                    score_cache.put_many(self.fingerprint, jd_hash, new_entries)
+        finally:
+            skills.close()
+
+    def _build_result(self, resume_text: str, jd_text: str, ml_prob: float, skill_data: dict) -> dict:
+        hybrid_score = self.compute_hybrid_score(resume_text, jd_text, ml_prob, skill_data)
+        return {
+            # Same decision as argmax over the two class probabilities
+            "prediction": LABEL_MAP[int(ml_prob > 0.5)],
+            "fit_probability": ml_prob,
+            "hybrid_fit_score": hybrid_score,
+            # Returned so callers don't re-run skill extraction
+            "skill_breakdown": skill_data
+        }
+
+    def _token_ids(self, texts: List[str], keys: List[str] | None = None) -> List[np.ndarray]:
+        """
+        Token IDs without special tokens for each text, from the token cache.
+        Distinct uncached texts are tokenized together in one call.
+        `keys` are the texts' content hashes, if the caller already has them.
+        """
+        keys = keys or [content_hash(text) for text in texts]
+        found = {}
+        pending = {}  # Deduplicated cache misses: key -> text
+        for key, text in zip(keys, texts):
+            if key in found or key in pending:
+                continue
+            ids = token_cache.get(key)
+            if ids is None:
+                pending[key] = text
+            else:
+                found[key] = ids
+        if pending:
+            with timed("tokenization"):
+                encoded = self.tokenizer(list(pending.values()), add_special_tokens=False)["input_ids"]
+            increment("tokenized_documents", len(pending))
+            increment("tokens", sum(len(ids) for ids in encoded))
+            for key, ids in zip(pending.keys(), encoded):
+                # int32 arrays take a fraction of the memory of lists of ints
+                ids = np.asarray(ids, dtype=np.int32)
+                token_cache.put(key, ids)
+                found[key] = ids
+        return [found[key] for key in keys]
+
+    def _encode_pairs(self, resumes: List[str], jd_text: str, resume_keys: List[str] | None = None) -> List[List[int]]:
+        """
+        Builds one truncated (resume, JD) pair per resume, without padding, from
+        cached token IDs; matches what the tokenizer produces for the text pair.
+        """
+        jd_ids = self._token_ids([jd_text])[0]
+        budget = MAX_LENGTH - self.tokenizer.num_special_tokens_to_add(pair=True)
+        sequences = []
+        for resume_ids in self._token_ids(resumes, resume_keys):
+            first, second = truncate_longest_first(resume_ids, jd_ids, budget)
+            sequences.append(self.tokenizer.build_inputs_with_special_tokens(first.tolist(), second.tolist()))
+        return sequences
+
+    def _encode_windows(self, resumes: List[str], jd_text: str,
+                        resume_keys: List[str] | None = None) -> Tuple[List[List[int]], List[int]]:
+        """
+        Splits each resume into overlapping token windows and pairs every window
+        with the same JD slice. Token IDs come from the token cache.
+        Returns the sequences and the resume index that owns each one.
+        """
+        jd_ids = self._token_ids([jd_text])[0][:JD_MAX_TOKENS].tolist()
+        window = MAX_LENGTH - self.tokenizer.num_special_tokens_to_add(pair=True) - len(jd_ids)
+        overlap = min(CHUNK_OVERLAP, window // 2)
+        step = window - overlap
+
+        sequences, owners = [], []
+        for owner, resume_ids in enumerate(self._token_ids(resumes, resume_keys)):
+            for start in range(0, max(len(resume_ids) - overlap, 1), step):
+                sequences.append(self.tokenizer.build_inputs_with_special_tokens(resume_ids[start:start + window].tolist(), jd_ids))
+                owners.append(owner)
+        return sequences, owners
+
+    def _reduce(self, probabilities: List[float]) -> float:
+        if self.chunk_reducer == "mean":
+            return sum(probabilities) / len(probabilities)
+        return max(probabilities)
+
+    def _predict_sequences(self, sequences: List[List[int]]) -> np.ndarray:
+        """Pads one batch of token sequences and returns its class probabilities."""
+        inputs = self.tokenizer.pad({"input_ids": sequences}, return_tensors="np")
+        return self.backend.predict_proba(inputs)
+
+    @staticmethod
+    def _sequence_order(sequences: List[List[int]]) -> List[int]:
+        """Sequence indices longest first, so similar lengths are padded together."""
+        return sorted(range(len(sequences)), key=lambda i: len(sequences[i]), reverse=True)
+
+    def _run_sequences(self, sequences: List[List[int]], batch_size: int,
+                       order: List[int] | None = None) -> Iterator[Tuple[List[int], np.ndarray]]:
+        """
+        Runs pre-tokenized sequences through the shared inference scheduler,
+        longest first so similar lengths end up padded together.
+        At most two micro-batches are queued at a time, so concurrent callers
+        interleave fairly; results are yielded as (sequence indices, class
+        probabilities) per micro-batch. Closing the generator cancels the
+        sequences still queued.
+        """
+        order = order if order is not None else self._sequence_order(sequences)
+        in_flight = deque()
+        submitted = 0
+        try:
+            while submitted < len(order) or in_flight:
+                while submitted < len(order) and len(in_flight) < 2 * batch_size:
+                    seq_idx = order[submitted]
+                    in_flight.append((seq_idx, self.scheduler.submit(sequences[seq_idx])))
+                    submitted += 1
+                batch = [in_flight.popleft() for _ in range(min(batch_size, len(in_flight)))]
+                # Queueing plus forward passes, as seen by this caller
+                with timed("inference_wait"):
+                    probabilities = np.stack([future.result() for _, future in batch])
+                yield [seq_idx for seq_idx, _ in batch], probabilities
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+
 prediction_service = PredictionService()
-print("Prediction Service is ready.")
@@ -1,112 +1,166 @@
+import csv
 import io
-import pandas as pd
+import os
+import tempfile
 import zipfile
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator
 from pathlib import Path
 
+import xlsxwriter
+
 # Define the directory where the original, ranked resumes are stored.
 # Based on your file structure, this is the 'temp_resumes' folder.
 TEMP_RESUMES_DIR = Path("temp_resumes")
 
-def generate_excel_report(data: List[Dict[str, Any]]) -> io.BytesIO:
+# Column order shared by the Excel and CSV reports
+REPORT_COLUMNS = ["Rank", "Resume Filename", "Relevance Score (%)", "Matched Skills", "Missing Skills"]
+# Rows buffered before each CSV chunk is sent
+CSV_ROWS_PER_CHUNK = 500
+
+
+def write_excel_report(rows: Iterable[Dict[str, Any]]) -> str:
     """
-    Generates a detailed resume ranking report in Excel format (XLSX).
+    Writes a detailed resume ranking report in Excel format (XLSX) to a
+    temporary file, row by row. xlsxwriter's constant_memory mode flushes each
+    row to disk as it is written, so memory does not grow with the row count.
 
     Args:
-        data: A list of dictionaries containing ranked resume data (including
-              Rank, Filename, Score, Matched Skills, Missing Skills).
+        rows: Ranked resume rows (Rank, Filename, Score, Matched Skills, Missing Skills).
 
     Returns:
-        io.BytesIO: A BytesIO buffer containing the Excel file content.
+        str: Path of the temporary .xlsx file; the caller deletes it once sent.
     """
-    # Define the desired column order for the Excel file
-    column_order = ["Rank", "Resume Filename", "Relevance Score (%)", "Matched Skills", "Missing Skills"]
-    df = pd.DataFrame(data, columns=column_order)
-    
-    excel_buffer = io.BytesIO()
-    
-    # Use xlsxwriter engine for advanced formatting
-    with pd.ExcelWriter(excel_buffer, engine="xlsxwriter") as writer:
-        
-        df.to_excel(writer, index=False, sheet_name="Resume_Insights")
-        worksheet = writer.sheets['Resume_Insights']
-        
+    fd, path = tempfile.mkstemp(suffix=".xlsx", prefix="resume_insights_")
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+        worksheet = workbook.add_worksheet("Resume_Insights")
+
         # Define header format
-        header_format = writer.book.add_format({
+        header_format = workbook.add_format({
             'bold': True,
             'text_wrap': True,
             'valign': 'top',
             'fg_color': '#D7E4BC', # Light green background
             'border': 1
         })
-        
-        # Apply header format
-        for col_num, value in enumerate(df.columns.values):
-            worksheet.write(0, col_num, value, header_format)
-            
+
         # Define data format (required for skill wrapping)
-        data_format = writer.book.add_format({'text_wrap': True, 'valign': 'top'})
-        
-        # Set column widths and apply data formatting to all columns (starting from row 1)
-        worksheet.set_column(0, 0, 5) 
-        worksheet.set_column(1, 1, 35) 
+        data_format = workbook.add_format({'text_wrap': True, 'valign': 'top'})
+
+        # Set column widths and apply data formatting to the skill columns
+        worksheet.set_column(0, 0, 5)
+        worksheet.set_column(1, 1, 35)
         worksheet.set_column(2, 2, 20)
         worksheet.set_column(3, 3, 60, data_format) # Matched Skills (with wrap)
         worksheet.set_column(4, 4, 60, data_format) # Missing Skills (with wrap)
-        
+
         # Freeze the header row
         worksheet.freeze_panes(1, 0)
 
-    excel_buffer.seek(0)
-    return excel_buffer
+        # constant_memory requires rows to be written strictly in order
+        worksheet.write_row(0, 0, REPORT_COLUMNS, header_format)
+        for row_num, row in enumerate(rows, start=1):
+            worksheet.write_row(row_num, 0, [row[column] for column in REPORT_COLUMNS])
+
+        workbook.close()
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
 
-def generate_csv_report(data: List[Dict[str, Any]]) -> io.BytesIO:
+def iter_csv_report(rows: Iterable[Dict[str, Any]], rows_per_chunk: int = CSV_ROWS_PER_CHUNK) -> Iterator[bytes]:
     """
-    Generates a resume ranking report in CSV format.
+    Streams a resume ranking report in CSV format, encoding a few hundred
+    rows at a time instead of building the whole file first.
 
-    Returns:
-        io.BytesIO: A BytesIO buffer containing the CSV file content.
+    Yields:
+        bytes: UTF-8 encoded CSV chunks, starting with the header row.
     """
-    column_order = ["Rank", "Resume Filename", "Relevance Score (%)", "Matched Skills", "Missing Skills"]
-    df = pd.DataFrame(data, columns=column_order)
-    
-    csv_buffer = io.BytesIO()
-    # Write the DataFrame to the buffer as a CSV file
-    csv_buffer.write(df.to_csv(index=False, encoding='utf-8').encode('utf-8'))
-    csv_buffer.seek(0)
-    return csv_buffer
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(REPORT_COLUMNS)
+    for row_num, row in enumerate(rows, start=1):
+        writer.writerow([row[column] for column in REPORT_COLUMNS])
+        if row_num % rows_per_chunk == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+# Formats that are already compressed are stored as-is instead of deflated
+STORED_EXTENSIONS = {".pdf", ".docx", ".odt", ".zip", ".png", ".jpg", ".jpeg", ".gif", ".webp"}
+# Bytes read from disk (and roughly yielded to the client) at a time
+ZIP_CHUNK_SIZE = int(os.getenv("HIRESENSE_ZIP_CHUNK_SIZE", str(64 * 1024)))
 
 
-def generate_resumes_zip(resumes: List[Dict[str, Any]]) -> io.BytesIO:
+class _StreamSink(io.RawIOBase):
     """
-    Creates a ZIP archive containing the ORIGINAL binary files (PDF/DOCX)
-    from the temp_resumes directory, using their exact original extensions.
+    Write-only, non-seekable file object that collects what ZipFile writes
+    until it is drained. Being unseekable makes ZipFile emit data descriptors
+    instead of seeking back to patch local headers.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_resumes_zip(resumes: List[Dict[str, Any]], chunk_size: int = ZIP_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Streams a ZIP archive containing the ORIGINAL binary files (PDF/DOCX)
+    of the given resumes, using their exact original extensions.
+    Files are read in chunks, so memory stays bounded by the chunk size
+    regardless of how many resumes are exported.
 
     Args:
-        resumes: A list of resume dictionaries, each containing 'filename' (name of the file in temp_resumes).
+        resumes: A list of resume dictionaries, each containing 'filename' and its 'path'.
 
-    Returns:
-        io.BytesIO: A BytesIO buffer containing the ZIP file content.
+    Yields:
+        bytes: Consecutive pieces of the ZIP file.
     """
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+    sink = _StreamSink()
+    with zipfile.ZipFile(sink, 'w') as zf:
         for resume in resumes:
             filename = resume['filename']
-            file_path = TEMP_RESUMES_DIR / filename
-
-            if file_path.exists() and file_path.is_file():
-                # Read the original file content in binary mode
-                try:
-                    with open(file_path, 'rb') as f:
-                        original_content = f.read()
-                    
-                    # Write the original binary content to the zip archive
-                    # The file inside the zip is saved with its original extension (e.g., .pdf)
-                    zf.writestr(f"ranked_resumes/{filename}", original_content)
-                except Exception as e:
-                    print(f"Error reading file {filename}: {e}")
-            else:
+            # Records carry their session-specific path
+            file_path = Path(resume.get('path') or TEMP_RESUMES_DIR / filename)
+
+            if not (file_path.exists() and file_path.is_file()):
                 print(f"Warning: Original file not found for {filename} at {file_path}")
+                continue
+
+            try:
+                # from_file records the size and modification time; the known size
+                # lets ZipFile decide up front whether ZIP64 headers are needed
+                zinfo = zipfile.ZipInfo.from_file(file_path, f"ranked_resumes/{filename}")
+                zinfo.compress_type = (
+                    zipfile.ZIP_STORED if file_path.suffix.lower() in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                )
+                with open(file_path, 'rb') as src, zf.open(zinfo, 'w') as dest:
+                    while chunk := src.read(chunk_size):
+                        dest.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            except Exception as e:
+                print(f"Error reading file {filename}: {e}")
+            data = sink.drain()
+            if data:
+                yield data
 
-    zip_buffer.seek(0)
-    return zip_buffer
+    # Central directory
+    yield sink.drain()
@@ -0,0 +1,38 @@
+# app/services/retrieval_service.py
+
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.services.embedding_service import generate_embeddings
+from app.services.scoring_service import calculate_similarities
+
+# Resumes forwarded to the cross-encoder when no threshold or top-K is given
+TWO_STAGE_TOP_K = int(os.getenv("HIRESENSE_TWO_STAGE_TOP_K", "50"))
+
+
+def shortlist_by_similarity(resume_texts: List[str], jd_text: str, top_k: Optional[int] = None,
+                            min_similarity: Optional[float] = None) -> Tuple[List[int], np.ndarray]:
+    """
+    Stage one of two-stage matching: ranks every resume by bi-encoder cosine
+    similarity to the JD. Returns the indices selected for cross-encoder scoring
+    (best first) and the similarity of every resume.
+    """
+    if top_k is None and min_similarity is None:
+        top_k = TWO_STAGE_TOP_K
+
+    jd_embedding = generate_embeddings([jd_text])[0]
+    resume_embeddings = generate_embeddings(resume_texts)
+    similarities = calculate_similarities(jd_embedding, resume_embeddings)
+
+    candidates = np.arange(len(resume_texts))
+    if min_similarity is not None:
+        candidates = candidates[similarities >= min_similarity]
+    if top_k is not None and top_k < len(candidates):
+        # Partial selection avoids sorting the whole pool
+        best = np.argpartition(-similarities[candidates], top_k - 1)[:top_k]
+        candidates = candidates[best]
+
+    selected = candidates[np.argsort(-similarities[candidates], kind="stable")]
+    return selected.tolist(), similarities
@@ -0,0 +1,172 @@
+# app/services/score_cache_service.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+from app.services.inference_backend_service import PROJECT_ROOT
+
+# ----------------- Configuration -----------------
+SCORE_CACHE_ENABLED = os.getenv("HIRESENSE_SCORE_CACHE", "1") == "1"
+SCORE_CACHE_PATH = os.getenv("HIRESENSE_SCORE_CACHE_PATH", os.path.join(PROJECT_ROOT, "score_cache.sqlite3"))
+# Oldest entries (by last access) are evicted beyond this many rows
+SCORE_CACHE_MAX_ENTRIES = int(os.getenv("HIRESENSE_SCORE_CACHE_MAX_ENTRIES", "200000"))
+# SQLite limits the number of bound parameters per statement
+_QUERY_CHUNK = 500
+
+
+def model_fingerprint(model_path: str, *settings) -> str:
+    """
+    Fingerprints a model checkpoint from its file names, sizes and modification
+    times, plus any settings that change the produced probabilities.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(model_path)):
+        path = os.path.join(model_path, name)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    for setting in settings:
+        digest.update(f"{setting};".encode())
+    return digest.hexdigest()[:16]
+
+
+class ScoreCache:
+    """
+    Persistent cache of ML probabilities and skill breakdowns keyed by
+    (model fingerprint, JD hash, resume hash), stored in SQLite.
+    """
+
+    def __init__(self, path: str = SCORE_CACHE_PATH, max_entries: int = SCORE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._connect()
+        if hasattr(os, "register_at_fork"):
+            # SQLite connections must not be shared with forked worker processes
+            os.register_at_fork(after_in_child=self._connect)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scores (
+                model TEXT NOT NULL,
+                jd_hash TEXT NOT NULL,
+                resume_hash TEXT NOT NULL,
+                fit_probability REAL NOT NULL,
+                skill_breakdown TEXT NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, jd_hash, resume_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_scores_last_access ON scores (last_access)")
+        # Upper bound on the row count, so inserts don't count the table every time
+        self._count = self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def _connect(self) -> None:
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    def get_many(self, model: str, jd_hash: str, resume_hashes: List[str]) -> Dict[str, Tuple[float, dict]]:
+        """Returns {resume_hash: (fit_probability, skill_breakdown)} for every cached hash."""
+        unique = list(dict.fromkeys(resume_hashes))
+        found = {}
+        with self._lock:
+            for start in range(0, len(unique), _QUERY_CHUNK):
+                chunk = unique[start:start + _QUERY_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT resume_hash, fit_probability, skill_breakdown FROM scores "
+                    f"WHERE model = ? AND jd_hash = ? AND resume_hash IN ({placeholders})",
+                    (model, jd_hash, *chunk),
+                ).fetchall()
+                for resume_hash, probability, breakdown in rows:
+                    found[resume_hash] = (probability, json.loads(breakdown))
+
+            if found:
+                now = time.time()
+                # One transaction for the batch instead of one per row
+                with self._transaction():
+                    self._conn.executemany(
+                        "UPDATE scores SET last_access = ? WHERE model = ? AND jd_hash = ? AND resume_hash = ?",
+                        [(now, model, jd_hash, resume_hash) for resume_hash in found],
+                    )
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, model: str, jd_hash: str, entries: List[Tuple[str, float, dict]]) -> None:
+        """Stores (resume_hash, fit_probability, skill_breakdown) entries and evicts if over capacity."""
+        if not entries:
+            return
+        now = time.time()
+        with self._lock, self._transaction():
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?, ?)",
+                [(model, jd_hash, resume_hash, probability, json.dumps(breakdown), now)
+                 for resume_hash, probability, breakdown in entries],
+            )
+            self._count += len(entries)  # Replaced rows are over-counted until the next recount
+            self._evict()
+
+    def _evict(self) -> None:
+        if self._count <= self.max_entries:
+            return
+        # Recount only when the estimate says the cache may be full; other
+        # worker processes insert into the same table
+        self._count = self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        if self._count <= self.max_entries:
+            return
+        # Trim an extra 10% so eviction doesn't run on every insert
+        excess = self._count - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM scores WHERE rowid IN (SELECT rowid FROM scores ORDER BY last_access LIMIT ?)",
+            (excess,),
+        )
+        self._count -= excess
+        self.evictions += excess
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM scores")
+            self._count = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """
+        Returns entry count, file size and hit-rate counters. The entry count is
+        the tracked one (no table scan), so it may run ahead by replaced rows.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "entries": self._count,
+                "max_entries": self.max_entries,
+                "size_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+score_cache = ScoreCache() if SCORE_CACHE_ENABLED else None
@@ -1,18 +1,25 @@
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 
 
-def calculate_similarity(jd_embedding : list[float] , resume_embedding : list[float]) -> float:
+def calculate_similarity(jd_embedding : np.ndarray , resume_embedding : np.ndarray) -> float:
     """
     Calculates the cosine similarity score between two embeddings.
     """
+    resume_mat = np.asarray(resume_embedding, dtype=np.float32).reshape(1, -1)
+    return float(calculate_similarities(jd_embedding, resume_mat, normalized=False)[0])
 
-    # Reshape lists into 2D arrays for the function
-    jd_vec = np.array(jd_embedding).reshape(1,-1)
 
-    resume_vec = np.array(resume_embedding).reshape(1, -1)
+def calculate_similarities(jd_embedding: np.ndarray, resume_embeddings: np.ndarray, normalized: bool = True) -> np.ndarray:
+    """
+    Calculates the cosine similarity between one JD embedding and every row of
+    a resume embedding matrix with a single matrix-vector product.
+    Embeddings from embedding_service are already unit length (normalized=True).
+    """
+    jd_vec = np.asarray(jd_embedding, dtype=np.float32).ravel()
+    resume_mat = np.asarray(resume_embeddings, dtype=np.float32)
 
-    # Calculate similarity
-    score = cosine_similarity(jd_vec, resume_vec)[0][0]
+    if not normalized:
+        jd_vec = jd_vec / max(float(np.linalg.norm(jd_vec)), 1e-12)
+        resume_mat = resume_mat / np.maximum(np.linalg.norm(resume_mat, axis=1, keepdims=True), 1e-12)
 
-    return float(score)
\ No newline at end of file
+    return resume_mat @ jd_vec
@@ -0,0 +1,443 @@
+# app/services/session_service.py
+
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+
+from app.services.inference_backend_service import PROJECT_ROOT
+from app.utils.cache_utils import LRUCache, content_hash
+from app.utils.resume_collection import ResumeCollection
+
+# ----------------- Configuration -----------------
+# memory : sessions live in this process (default)
+# sqlite : sessions are persisted to SQLite and can be shared by several workers
+SESSION_STORE = os.getenv("HIRESENSE_SESSION_STORE", "memory")
+SESSION_DB_PATH = os.getenv("HIRESENSE_SESSION_DB_PATH", os.path.join(PROJECT_ROOT, "sessions.sqlite3"))
+DEFAULT_SESSION_ID = "default"
+# Text held by one session (JD plus resume contents)
+SESSION_MAX_BYTES = int(os.getenv("HIRESENSE_SESSION_MAX_MB", "64")) * 1024 * 1024
+# Sessions untouched for this long are evicted along with their files
+SESSION_IDLE_SECONDS = int(os.getenv("HIRESENSE_SESSION_IDLE_SECONDS", "7200"))
+# Least recently used sessions are evicted beyond this many
+MAX_SESSIONS = int(os.getenv("HIRESENSE_MAX_SESSIONS", "100"))
+# Storage directories; each session works in its own subfolder of these
+JD_UPLOAD_DIR = "jd_files"
+TEMP_RESUME_DIR = "temp_resumes"
+ACCEPTED_RESUME_DIR = "accepted_resumes"
+# Subfolders removed when a session is evicted (accepted resumes are kept)
+SESSION_FILE_DIRS = (JD_UPLOAD_DIR, TEMP_RESUME_DIR)
+
+_EVICTION_INTERVAL = 60
+# Unchanged sessions refresh their last access time at most this often
+_TOUCH_INTERVAL = 60
+_SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class SessionLimitError(Exception):
+    """Raised when a session would exceed its memory budget."""
+
+
+class Session:
+    """
+    One recruiter's workspace: the current JD and the uploaded resumes.
+    Files belonging to the session are kept in per-session subfolders.
+    """
+
+    def __init__(self, session_id: str, jd: Optional[dict] = None, resumes: Optional[List[dict]] = None,
+                 last_access: Optional[float] = None):
+        self.id = session_id
+        self.jd = jd
+        self._jd_changed = False
+        self.resumes = ResumeCollection(resumes or ())
+        self.last_access = last_access or time.time()
+        # Store revision this object reflects, and the last access time the
+        # store has on record (SQLite store)
+        self.version = 0
+        self.persisted_access = 0.0
+
+    @property
+    def jd(self) -> Optional[dict]:
+        return self._jd
+
+    @jd.setter
+    def jd(self, jd: Optional[dict]) -> None:
+        # Hashed once here; scores record which JD produced them by this hash
+        if jd is not None and "hash" not in jd:
+            jd = {**jd, "hash": content_hash(jd["content"])}
+        self._jd = jd
+        self._jd_changed = True
+
+    def take_jd_change(self) -> bool:
+        """True if the JD was replaced since the last call."""
+        changed, self._jd_changed = self._jd_changed, False
+        return changed
+
+    def directory(self, base: str) -> str:
+        """Returns (and creates) this session's subfolder of a storage directory."""
+        path = os.path.join(base, self.id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def size_bytes(self) -> int:
+        """Approximate memory held by the session's text."""
+        size = len(self.jd["content"]) if self.jd else 0
+        return size + self.resumes.content_bytes
+
+    def check_capacity(self, extra_bytes: int = 0) -> None:
+        if self.size_bytes() + extra_bytes > SESSION_MAX_BYTES:
+            raise SessionLimitError(
+                f"Session '{self.id}' would exceed its {SESSION_MAX_BYTES // (1024 * 1024)} MB limit."
+            )
+
+
+def remove_session_files(session_id: str) -> None:
+    for base in SESSION_FILE_DIRS:
+        shutil.rmtree(os.path.join(base, session_id), ignore_errors=True)
+
+
+class SessionStore(ABC):
+    """Interface for session storage backends."""
+
+    def __init__(self, idle_seconds: int = SESSION_IDLE_SECONDS, max_sessions: int = MAX_SESSIONS):
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self.evictions = 0
+        self._last_eviction = 0.0
+
+    @abstractmethod
+    def load(self, session_id: str) -> Session:
+        """Returns the session, creating an empty one if it does not exist."""
+
+    @abstractmethod
+    def save(self, session: Session) -> None:
+        """Persists what changed in the session since it was loaded or last saved."""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Removes the session from the store (its files are left to the caller)."""
+
+    @abstractmethod
+    def _idle_sessions(self, now: float) -> List[str]:
+        """Session IDs past the idle timeout, plus the least recently used ones over capacity."""
+
+    def evict_idle(self, force: bool = False) -> List[str]:
+        """Evicts idle sessions and their files. Runs at most once a minute unless forced."""
+        now = time.time()
+        if not force and now - self._last_eviction < _EVICTION_INTERVAL:
+            return []
+        self._last_eviction = now
+        evicted = self._idle_sessions(now)
+        for session_id in evicted:
+            self.delete(session_id)
+            remove_session_files(session_id)
+        self.evictions += len(evicted)
+        if evicted:
+            print(f"Evicted {len(evicted)} idle sessions.")
+        return evicted
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Backend name, number of sessions, their total text size and evictions so far."""
+
+
+class InMemorySessionStore(SessionStore):
+    """Keeps live Session objects in a dict; requests mutate them in place."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sessions: Dict[str, Session] = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> Session:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session(session_id)
+            session.last_access = time.time()
+            return session
+
+    def save(self, session: Session) -> None:
+        # The live object is the stored one; only the change markers are reset
+        session.resumes.take_changes()
+        session.take_jd_change()
+        with self._lock:
+            session.last_access = time.time()
+            self._sessions[session.id] = session
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _idle_sessions(self, now: float) -> List[str]:
+        with self._lock:
+            by_age = sorted(self._sessions.values(), key=lambda s: s.last_access)
+        idle = [s.id for s in by_age if now - s.last_access > self.idle_seconds]
+        overflow = len(by_age) - len(idle) - self.max_sessions
+        if overflow > 0:
+            idle += [s.id for s in by_age[len(idle):len(idle) + overflow]]
+        return idle
+
+    def stats(self) -> dict:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            "backend": "memory",
+            "sessions": len(sessions),
+            "total_bytes": sum(s.size_bytes() for s in sessions),
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Persists sessions in SQLite so they survive restarts and are shared by
+    several worker processes. Each resume is its own row keyed by
+    (session_id, filename), and a save writes only the rows that changed, so
+    concurrent requests on different resumes never overwrite each other.
+
+    Every save bumps the session's version and stamps the rows it writes with
+    it. Each process keeps its Session objects in memory and, on load, applies
+    only the rows newer than the version it holds, so an unchanged session
+    costs one small query instead of a rebuild.
+    """
+
+    def __init__(self, path: str = SESSION_DB_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._lock = threading.Lock()
+        self._sessions = LRUCache(2 * self.max_sessions)
+        self._connect()
+        if hasattr(os, "register_at_fork"):
+            # SQLite connections must not be shared with forked worker processes
+            os.register_at_fork(after_in_child=self._connect)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS session_state (
+                id TEXT PRIMARY KEY,
+                jd TEXT,
+                size_bytes INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                version INTEGER NOT NULL,
+                jd_version INTEGER NOT NULL,
+                cleared_version INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_session_state_last_access ON session_state (last_access);
+            -- data is NULL for a removed resume, so other processes see the removal
+            CREATE TABLE IF NOT EXISTS session_resumes (
+                session_id TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                data TEXT,
+                version INTEGER NOT NULL,
+                PRIMARY KEY (session_id, filename)
+            );
+            CREATE INDEX IF NOT EXISTS idx_session_resumes_version ON session_resumes (session_id, version);
+            """
+        )
+
+    def _connect(self) -> None:
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    # ----------------- Loading -----------------
+    def _state(self, session_id: str) -> Optional[Tuple[int, int, int, float]]:
+        return self._conn.execute(
+            "SELECT version, jd_version, cleared_version, last_access FROM session_state WHERE id = ?", (session_id,)
+        ).fetchone()
+
+    def load(self, session_id: str) -> Session:
+        with self._lock:
+            state = self._state(session_id)
+            session = self._sessions.get(session_id)
+            if session is None or (state is None and session.version):
+                # Not held here yet, or deleted by another process
+                session = Session(session_id)
+                self._sessions.put(session_id, session)
+            if state is not None:
+                self._sync(session, state)
+        session.last_access = time.time()
+        return session
+
+    def _sync(self, session: Session, state: Tuple[int, int, int, float]) -> None:
+        """
+        Applies changes other processes saved since session.version. Resumes
+        added or removed locally but not yet saved, and an unsaved JD, keep their
+        local state; a removal elsewhere wins over an unsaved score update here.
+        """
+        version, jd_version, cleared_version, session.persisted_access = state
+        if version == session.version:
+            return
+        resumes = session.resumes
+        with resumes.untracked():
+            if cleared_version > session.version:
+                # Reset elsewhere: rebuild from the rows written since
+                resumes.clear()
+                since = 0
+            else:
+                since = session.version
+            rows = self._conn.execute(
+                "SELECT filename, data FROM session_resumes WHERE session_id = ? AND version > ? ORDER BY rowid",
+                (session.id, since),
+            ).fetchall()
+            for filename, data in rows:
+                pending = resumes.pending_change(filename)
+                if pending in ("add", "remove") or (pending == "update" and data is not None):
+                    continue
+                if data is None:
+                    resumes.remove(filename)
+                    continue
+                record = json.loads(data)
+                current = resumes.get(filename)
+                if current is not None and current["content"] == record["content"]:
+                    # Updated in place, so match jobs still recognise the record
+                    for key in current.keys() - record.keys():
+                        del current[key]
+                    current.update(record)
+                    resumes.reposition(filename)
+                else:
+                    resumes.add(record)
+        if jd_version > session.version and not session._jd_changed:
+            jd = self._conn.execute("SELECT jd FROM session_state WHERE id = ?", (session.id,)).fetchone()[0]
+            session.jd = json.loads(jd) if jd else None
+            session.take_jd_change()
+        session.version = version
+
+    # ----------------- Saving -----------------
+    def save(self, session: Session) -> None:
+        now = time.time()
+        if not (session.resumes.has_changes() or session._jd_changed):
+            # Read-only request: no write unless the stored idle clock needs refreshing
+            if now - session.persisted_access > _TOUCH_INTERVAL:
+                with self._lock:
+                    self._conn.execute("UPDATE session_state SET last_access = ? WHERE id = ?", (now, session.id))
+                session.persisted_access = now
+            session.last_access = now
+            return
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            cleared, changed, jd_changed = False, {}, False
+            try:
+                # Other processes' changes first; our unsaved ones are still marked and win
+                state = self._state(session.id)
+                if state is not None:
+                    self._sync(session, state)
+                cleared, changed = session.resumes.take_changes()
+                jd_changed = session.take_jd_change()
+                self._write(session, state, cleared, changed, jd_changed)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                session.resumes.restore_changes(cleared, changed)
+                session._jd_changed = session._jd_changed or jd_changed
+                raise
+        session.last_access = now
+
+    def _write(self, session: Session, state: Optional[Tuple[int, int, int, float]], cleared: bool,
+               changed: Dict[str, str], jd_changed: bool) -> None:
+        """Writes the changed rows as the session's next version. Call inside a transaction."""
+        now = time.time()
+        version, jd_version, cleared_version = state[:3] if state else (0, 0, 0)
+        version += 1
+        if cleared:
+            self._conn.execute("DELETE FROM session_resumes WHERE session_id = ?", (session.id,))
+            cleared_version = version
+        with session.resumes.lock:
+            # Serialized under the lock: match jobs update records from other threads
+            rows = []
+            # In upload order, so rowid order matches it for the next full load
+            for filename in sorted(changed, key=session.resumes.upload_order):
+                record = session.resumes.get(filename)
+                if record is not None:
+                    rows.append((session.id, filename, json.dumps(record), version))
+                elif not cleared:
+                    rows.append((session.id, filename, None, version))
+            jd = json.dumps(session.jd) if session.jd else None
+            size = session.size_bytes()
+        self._conn.executemany(
+            "INSERT INTO session_resumes VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (session_id, filename) DO UPDATE SET data = excluded.data, version = excluded.version",
+            rows,
+        )
+        if jd_changed:
+            jd_version = version
+        self._conn.execute(
+            "INSERT INTO session_state VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET jd = CASE WHEN ? THEN excluded.jd ELSE jd END, "
+            "size_bytes = excluded.size_bytes, last_access = excluded.last_access, version = excluded.version, "
+            "jd_version = excluded.jd_version, cleared_version = excluded.cleared_version",
+            (session.id, jd, size, now, version, jd_version, cleared_version, jd_changed),
+        )
+        session.version = version
+        session.persisted_access = now
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM session_resumes WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM session_state WHERE id = ?", (session_id,))
+            self._conn.execute("COMMIT")
+            self._sessions.put(session_id, Session(session_id))
+
+    def _idle_sessions(self, now: float) -> List[str]:
+        with self._lock:
+            idle = [row[0] for row in self._conn.execute(
+                "SELECT id FROM session_state WHERE last_access < ? ORDER BY last_access", (now - self.idle_seconds,)
+            )]
+            count = self._conn.execute("SELECT COUNT(*) FROM session_state").fetchone()[0]
+            overflow = count - len(idle) - self.max_sessions
+            if overflow > 0:
+                idle += [row[0] for row in self._conn.execute(
+                    "SELECT id FROM session_state WHERE last_access >= ? ORDER BY last_access LIMIT ?",
+                    (now - self.idle_seconds, overflow),
+                )]
+        return idle
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM session_state"
+            ).fetchone()
+        return {"backend": "sqlite", "path": self.path, "sessions": count, "total_bytes": total, "evictions": self.evictions}
+
+
+def create_session_store(backend: str = SESSION_STORE) -> SessionStore:
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "memory":
+        return InMemorySessionStore()
+    raise ValueError(f"Unknown session store '{backend}'. Expected 'memory' or 'sqlite'.")
+
+
+session_store = create_session_store()
+
+
+# ----------------- FastAPI Dependency -----------------
+async def get_session(
+    x_session_id: Optional[str] = Header(None, description="Workspace ID; defaults to the shared 'default' session"),
+    session_id: Optional[str] = Query(None, description="Workspace ID (alternative to the X-Session-ID header)"),
+) -> AsyncIterator[Session]:
+    """
+    Resolves the caller's session from the X-Session-ID header or the
+    session_id query parameter and saves what the request changed once it is
+    handled. Store I/O runs in the threadpool, off the event loop.
+    """
+    resolved = x_session_id or session_id or DEFAULT_SESSION_ID
+    if not _SESSION_ID_PATTERN.match(resolved):
+        raise HTTPException(status_code=400, detail="Session IDs may only contain letters, digits, '-' and '_' (max 64).")
+
+    await run_in_threadpool(session_store.evict_idle)
+    session = await run_in_threadpool(session_store.load, resolved)
+    try:
+        yield session
+    finally:
+        await run_in_threadpool(session_store.save, session)
@@ -3,14 +3,30 @@
 import fitz   # PyMuPDF library for working with PDF files
 from typing import BinaryIO  ## Used to type-hint(specify dataype) the input as a binary file stream
 import docx2txt  
-import os
+import io
+import re
+import shutil
+import subprocess
 import tempfile
+import threading
+import time
+import zipfile
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Tuple
+from xml.etree import ElementTree
 
-""" Extract Text from a PDF file stream """
-def extract_text_from_pdf_file(file:BinaryIO)->str:
+from app.services.metrics_service import increment, observe
+
+# The extractors work directly on in-memory bytes, so an upload is read once
+# and never written to a temporary file just to be parsed.
+Buffer = bytes | bytearray | memoryview
+
+""" Extract Text from PDF bytes """
+def extract_text_from_pdf_bytes(data: Buffer) -> str:
     try:
         text='' 
-        pdf=fitz.open(stream=file.read(),filetype="pdf") 
+        # PyMuPDF accepts bytes without copying; other buffers are converted once
+        pdf=fitz.open(stream=data if isinstance(data, bytes) else bytes(data),filetype="pdf") 
         for page in pdf:
             text+=page.get_text()
         pdf.close()
@@ -19,39 +35,334 @@ def extract_text_from_pdf_file(file:BinaryIO)->str:
         raise RuntimeError(f"Error extracting text from PDF file: {e}")
 
 
-""" Extract Text from a DOCX file stream """
-def extract_text_from_docx_file(file: BinaryIO) -> str:
+""" Extract Text from DOCX bytes """
+def extract_text_from_docx_bytes(data: Buffer) -> str:
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as temp_file:
-            temp_file.write(file.read())
-            temp_file_path = temp_file.name
-
-        text = docx2txt.process(temp_file_path)
-        os.remove(temp_file_path)
+        # docx2txt opens the archive with zipfile, which reads straight from the in-memory buffer
+        text = docx2txt.process(io.BytesIO(data))
         return text.strip()
     except Exception as e:
          raise RuntimeError(f"Error extracting text from DOCX file: {e}")
 
 
 
-""" Extract Text from a TXT file stream """
-def extract_text_from_txt_file(file: BinaryIO) -> str:
+""" Extract Text from TXT bytes """
+def extract_text_from_txt_bytes(data: Buffer) -> str:
     try:
-        content= file.read().decode("utf-8")
+        content= str(data, "utf-8")
         return content.strip()
     except Exception as e:
         raise RuntimeError(f"Error extracting text from TXT file: {e}")
 
 
-"""Detect file type based on content_type and delegate:Unified Extractor"""
-def extract_text_from_file(file:BinaryIO,content_type:str)-> str:
-    if content_type == "application/pdf":
-        return extract_text_from_pdf_file(file)
-    elif content_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-        return extract_text_from_docx_file(file)
-    elif content_type == "text/plain":
-        return extract_text_from_txt_file(file)
-    else:
+# ----------------- Additional Formats -----------------
+_RTF_DESTINATIONS = {
+    "aftncn", "aftnsep", "aftnsepc", "annotation", "atnauthor", "atndate", "atnicn", "atnid",
+    "atnparent", "atnref", "atntime", "atrfend", "atrfstart", "author", "background",
+    "bkmkend", "bkmkstart", "buptim", "colortbl", "comment", "creatim", "datafield", "do",
+    "doccomm", "docvar", "dptxbxtext", "falt", "fchars", "ffdeftext", "ffentrymcr", "ffexitmcr",
+    "ffformat", "ffhelptext", "ffl", "ffname", "ffstattext", "field", "file", "filetbl",
+    "fldinst", "fldtype", "fname", "fontemb", "fontfile", "fonttbl", "footer", "footerf",
+    "footerl", "footerr", "footnote", "ftncn", "ftnsep", "ftnsepc", "header", "headerf",
+    "headerl", "headerr", "info", "keywords", "levelnumbers", "leveltext", "lfolevel",
+    "listoverridetable", "listtable", "listtext", "manager", "nextfile", "nonshppict",
+    "objalias", "objclass", "objdata", "object", "objname", "objsect", "operator", "panose",
+    "pict", "pn", "pntext", "pntxta", "pntxtb", "printim", "private", "pxe", "revtbl",
+    "revtim", "rsidtbl", "rxe", "shp", "shpinst", "shppict", "stylesheet", "subject",
+    "tc", "template", "title", "txe", "ud", "upr", "userprops", "xe", "xmlnstbl",
+}
+_RTF_SPECIAL_WORDS = {"par": "\n", "sect": "\n\n", "page": "\n\n", "line": "\n", "tab": "\t",
+                      "emdash": "\u2014", "endash": "\u2013", "bullet": "\u2022",
+                      "lquote": "\u2018", "rquote": "\u2019", "ldblquote": "\u201c", "rdblquote": "\u201d"}
+_RTF_TOKEN = re.compile(r"\\([a-z]{1,32})(-?\d{1,10})?[ ]?|\\'([0-9a-f]{2})|\\([^a-z])|([{}])|[\r\n]+|(.)", re.I)
+
+
+def extract_text_from_rtf_bytes(data: Buffer) -> str:
+    try:
+        text = str(data, "latin-1")
+        stack = []
+        ignorable = False   # Inside a destination group that holds no body text
+        uc_skip = 1         # Fallback characters that follow a \uN escape
+        skip = 0
+        out = []
+        for match in _RTF_TOKEN.finditer(text):
+            word, arg, hex_char, escaped, brace, char = match.groups()
+            if brace:
+                skip = 0
+                if brace == "{":
+                    stack.append((uc_skip, ignorable))
+                elif stack:
+                    uc_skip, ignorable = stack.pop()
+            elif escaped:
+                skip = 0
+                if escaped == "*":
+                    ignorable = True
+                elif ignorable:
+                    pass
+                elif escaped == "~":
+                    out.append("\u00a0")
+                elif escaped in "{}\\":
+                    out.append(escaped)
+            elif word:
+                skip = 0
+                word = word.lower()
+                if word in _RTF_DESTINATIONS:
+                    ignorable = True
+                elif ignorable:
+                    pass
+                elif word in _RTF_SPECIAL_WORDS:
+                    out.append(_RTF_SPECIAL_WORDS[word])
+                elif word == "uc":
+                    uc_skip = int(arg)
+                elif word == "u":
+                    code = int(arg)
+                    out.append(chr(code + 65536 if code < 0 else code))
+                    skip = uc_skip
+            elif hex_char:
+                if skip > 0:
+                    skip -= 1
+                elif not ignorable:
+                    out.append(bytes([int(hex_char, 16)]).decode("cp1252", errors="replace"))
+            elif char:
+                if skip > 0:
+                    skip -= 1
+                elif not ignorable:
+                    out.append(char)
+        return "".join(out).strip()
+    except Exception as e:
+        raise RuntimeError(f"Error extracting text from RTF file: {e}")
+
+
+_ODT_TEXT_NS = "urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+_ODT_BLOCKS = {f"{{{_ODT_TEXT_NS}}}p", f"{{{_ODT_TEXT_NS}}}h"}
+
+
+def extract_text_from_odt_bytes(data: Buffer) -> str:
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            root = ElementTree.fromstring(archive.read("content.xml"))
+        paragraphs = ["".join(element.itertext()) for element in root.iter() if element.tag in _ODT_BLOCKS]
+        return "\n".join(paragraphs).strip()
+    except Exception as e:
+        raise RuntimeError(f"Error extracting text from ODT file: {e}")
+
+
+class _HTMLTextParser(HTMLParser):
+    """Collects visible text, skipping scripts and styles and breaking lines at block tags."""
+
+    _SKIP = {"script", "style", "head", "noscript", "template"}
+    _BLOCKS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "table"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skip_depth += 1
+        elif tag in self._BLOCKS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in self._BLOCKS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def extract_text_from_html_bytes(data: Buffer) -> str:
+    try:
+        parser = _HTMLTextParser()
+        parser.feed(str(data, "utf-8", errors="replace"))
+        parser.close()
+        text = "".join(parser.parts)
+        return re.sub(r"\n\s*\n+", "\n\n", text).strip()
+    except Exception as e:
+        raise RuntimeError(f"Error extracting text from HTML file: {e}")
+
+
+def extract_text_from_doc_bytes(data: Buffer) -> str:
+    # Legacy Word binaries need an external converter; antiword only reads from a path
+    antiword = shutil.which("antiword")
+    if antiword is None:
+        raise RuntimeError("Error extracting text from DOC file: 'antiword' is not installed.")
+    try:
+        with tempfile.NamedTemporaryFile(suffix=".doc") as temp_file:
+            temp_file.write(data)
+            temp_file.flush()
+            result = subprocess.run([antiword, temp_file.name], capture_output=True, check=True, timeout=60)
+        return result.stdout.decode("utf-8", errors="replace").strip()
+    except Exception as e:
+        raise RuntimeError(f"Error extracting text from DOC file: {e}")
+
+
+# ----------------- Extractor Registry -----------------
+# Formats are detected from magic bytes first, falling back to the client's
+# content type. Other modules can add formats with register_extractor().
+_EXTRACTORS: Dict[str, Callable[[Buffer], str]] = {}
+_SNIFFERS: List[Tuple[str, Callable[[bytes], bool]]] = []
+_ZIP_MARKERS: List[Tuple[str, str]] = []
+_MEDIA_TYPE_FORMATS: Dict[str, str] = {}
+FORMAT_MEDIA_TYPES: Dict[str, str] = {}
+
+# Only the head of each file is inspected when sniffing
+SNIFF_BYTES = 4096
+
+_stats_lock = threading.Lock()
+_extraction_stats: Dict[str, Dict[str, float]] = {}
+
+
+def register_extractor(fmt: str, extract: Callable[[Buffer], str], media_types: Tuple[str, ...] = (),
+                       sniff: Callable[[bytes], bool] | None = None, zip_entry: str | None = None) -> None:
+    """
+    Registers an extractor for a format. The first media type is the canonical
+    one; sniff receives the first SNIFF_BYTES of the file, and zip_entry names a
+    member that identifies zip-based formats.
+    """
+    _EXTRACTORS[fmt] = extract
+    if sniff is not None:
+        _SNIFFERS.append((fmt, sniff))
+    if zip_entry is not None:
+        _ZIP_MARKERS.append((fmt, zip_entry))
+    for media_type in media_types:
+        _MEDIA_TYPE_FORMATS[media_type] = fmt
+    if media_types:
+        FORMAT_MEDIA_TYPES.setdefault(fmt, media_types[0])
+
+
+def _zip_entries(data: Buffer) -> set:
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            return set(archive.namelist())
+    except zipfile.BadZipFile:
+        return set()
+
+
+def _looks_like_text(head: bytes) -> bool:
+    if b"\x00" in head:
+        return False
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off at the end of the sniffed head is fine
+        return e.start >= len(head) - 3
+    return True
+
+
+def detect_format(data: Buffer, content_type: str | None = None) -> str | None:
+    """
+    Detects the document format from magic bytes, then the content type, then
+    a plain-text heuristic. Returns None if the format is unsupported.
+    """
+    head = bytes(data[:SNIFF_BYTES])
+    for fmt, sniff in _SNIFFERS:
+        if sniff(head):
+            return fmt
+    # Zip containers (e.g. DOCX) are told apart by their members
+    if head.startswith(b"PK\x03\x04") and _ZIP_MARKERS:
+        entries = _zip_entries(data)
+        for fmt, entry in _ZIP_MARKERS:
+            if entry in entries:
+                return fmt
+    if content_type:
+        fmt = _MEDIA_TYPE_FORMATS.get(content_type.split(";")[0].strip().lower())
+        if fmt:
+            return fmt
+    if head and _looks_like_text(head):
+        return "txt"
+    return None
+
+
+def detect_file_format(file_path: str) -> str | None:
+    """
+    Detects the format of a file on disk. Only the head of the file is read,
+    plus the central directory for zip containers.
+    """
+    with open(file_path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+    if head.startswith(b"PK\x03\x04") and _ZIP_MARKERS:
+        try:
+            with zipfile.ZipFile(file_path) as archive:
+                entries = set(archive.namelist())
+        except zipfile.BadZipFile:
+            entries = set()
+        for fmt, entry in _ZIP_MARKERS:
+            if entry in entries:
+                return fmt
+    return detect_format(head)
+
+
+def _record_extraction(fmt: str, size: int, seconds: float, failed: bool) -> None:
+    with _stats_lock:
+        entry = _extraction_stats.setdefault(fmt, {"files": 0, "failures": 0, "bytes": 0, "seconds": 0.0})
+        entry["files"] += 1
+        entry["failures"] += int(failed)
+        entry["bytes"] += size
+        entry["seconds"] += seconds
+    observe("extraction", seconds)
+    increment("extracted_bytes", size)
+    if failed:
+        increment("extraction_failures")
+
+
+def get_extraction_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Per-format file counts, bytes and extraction time for this process
+    (work done in a process pool is counted by the worker processes).
+    """
+    with _stats_lock:
+        return {fmt: dict(entry) for fmt, entry in _extraction_stats.items()}
+
+
+register_extractor("pdf", extract_text_from_pdf_bytes, ("application/pdf",),
+                   sniff=lambda head: b"%PDF-" in head[:1024])
+register_extractor("docx", extract_text_from_docx_bytes,
+                   ("application/vnd.openxmlformats-officedocument.wordprocessingml.document",),
+                   zip_entry="word/document.xml")
+register_extractor("odt", extract_text_from_odt_bytes, ("application/vnd.oasis.opendocument.text",),
+                   sniff=lambda head: head[30:38] == b"mimetype" and head[38:77] == b"application/vnd.oasis.opendocument.text")
+register_extractor("rtf", extract_text_from_rtf_bytes, ("application/rtf", "text/rtf"),
+                   sniff=lambda head: head.startswith(b"{\\rtf"))
+register_extractor("doc", extract_text_from_doc_bytes, ("application/msword",),
+                   sniff=lambda head: head.startswith(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"))
+register_extractor("html", extract_text_from_html_bytes, ("text/html", "application/xhtml+xml"),
+                   sniff=lambda head: head.lstrip(b"\xef\xbb\xbf \t\r\n")[:15].lower().startswith((b"<!doctype html", b"<html")))
+register_extractor("txt", extract_text_from_txt_bytes, ("text/plain",))
+
+
+"""Detect the format from the content itself and delegate: Unified Extractor"""
+def extract_text_from_bytes(data: Buffer, content_type: str | None = None, fmt: str | None = None) -> str:
+    fmt = fmt or detect_format(data, content_type)
+    if fmt is None:
         raise ValueError(f"Unsupported file type: {content_type}")
-    
 
+    start = time.perf_counter()
+    failed = True
+    try:
+        text = _EXTRACTORS[fmt](data)
+        failed = False
+        return text
+    finally:
+        _record_extraction(fmt, len(data), time.perf_counter() - start, failed)
+
+
+""" File-stream wrappers around the in-memory extractors """
+def extract_text_from_pdf_file(file: BinaryIO) -> str:
+    return extract_text_from_pdf_bytes(file.read())
+
+
+def extract_text_from_docx_file(file: BinaryIO) -> str:
+    return extract_text_from_docx_bytes(file.read())
+
+
+def extract_text_from_txt_file(file: BinaryIO) -> str:
+    return extract_text_from_txt_bytes(file.read())
+
+
+def extract_text_from_file(file:BinaryIO,content_type:str | None = None)-> str:
+    return extract_text_from_bytes(file.read(), content_type)
@@ -0,0 +1,103 @@
+# app/services/upload_service.py
+
+import asyncio
+import contextvars
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Tuple
+
+from fastapi import UploadFile
+from app.services.textextract_service import detect_format, extract_text_from_bytes
+
+# ----------------- Configuration -----------------
+# Files parsed concurrently; also bounds how many uploads are in flight at once
+EXTRACTION_WORKERS = int(os.getenv("HIRESENSE_EXTRACTION_WORKERS", str(min(8, os.cpu_count() or 1))))
+# "thread" suits I/O-heavy batches; "process" sidesteps the GIL for CPU-heavy PDFs
+EXTRACTION_EXECUTOR = os.getenv("HIRESENSE_EXTRACTION_EXECUTOR", "thread")
+
+_executor: Executor | None = None
+
+
+def get_extraction_executor() -> Executor:
+    """Creates the shared extraction pool on first use."""
+    global _executor
+    if _executor is None:
+        if EXTRACTION_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=EXTRACTION_WORKERS, thread_name_prefix="extract")
+    return _executor
+
+
+def _write_bytes(file_path: str, data: bytes) -> None:
+    with open(file_path, "wb") as buffer:
+        buffer.write(data)
+
+
+def _remove_quietly(file_path: str) -> None:
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
+
+
+async def save_and_extract(data: bytes, file_path: str, content_type: str) -> str:
+    """
+    Persists the original upload and extracts its text concurrently, both from
+    the same in-memory bytes. The saved file is removed again if parsing fails.
+    """
+    # Reject unsupported formats before anything touches the disk
+    fmt = detect_format(data, content_type)
+    if fmt is None:
+        raise ValueError(f"Unsupported file type: {content_type}")
+
+    loop = asyncio.get_running_loop()
+    save_task = loop.run_in_executor(None, _write_bytes, file_path, data)
+    executor = get_extraction_executor()
+    call = (extract_text_from_bytes, data, content_type, fmt)
+    if isinstance(executor, ThreadPoolExecutor):
+        # Executor threads don't inherit contextvars; running in a copy of the
+        # context lets the extraction time reach this request's Server-Timing
+        call = (contextvars.copy_context().run, *call)
+    extract_task = loop.run_in_executor(executor, *call)
+    content, saved = await asyncio.gather(extract_task, save_task, return_exceptions=True)
+
+    if isinstance(content, Exception):
+        if not isinstance(saved, Exception):
+            await loop.run_in_executor(None, _remove_quietly, file_path)
+        raise content
+    if isinstance(saved, Exception):
+        raise saved
+    return content
+
+
+async def _ingest_one(file: UploadFile, dest_dir: str, semaphore: asyncio.Semaphore) -> dict:
+    async with semaphore:
+        file_path = os.path.join(dest_dir, file.filename)
+        # Read once; the same bytes feed both the disk write and the parser
+        data = await file.read()
+        content = await save_and_extract(data, file_path, file.content_type)
+        return {"filename": file.filename, "content": content, "path": file_path}
+
+
+async def ingest_resumes(files: List[UploadFile], dest_dir: str) -> Tuple[List[dict], List[dict]]:
+    """
+    Saves and extracts many uploads concurrently on a bounded worker pool,
+    holding at most 2 x EXTRACTION_WORKERS uploads in memory at a time.
+    Returns (records in upload order, per-file failures).
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    semaphore = asyncio.Semaphore(EXTRACTION_WORKERS * 2)
+    results = await asyncio.gather(
+        *(_ingest_one(file, dest_dir, semaphore) for file in files),
+        return_exceptions=True,
+    )
+
+    records, failures = [], []
+    for file, result in zip(files, results):
+        if isinstance(result, Exception):
+            print(f"Error processing {file.filename}: {result}")
+            failures.append({"filename": file.filename, "error": str(result)})
+        else:
+            records.append(result)
+    return records, failures
@@ -0,0 +1,355 @@
+# app/services/vector_index_service.py
+
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from app.services.embedding_service import generate_embeddings
+from app.services.inference_backend_service import PROJECT_ROOT
+from app.utils.cache_utils import content_hash
+
+# ----------------- Configuration -----------------
+TALENT_POOL_ENABLED = os.getenv("HIRESENSE_TALENT_POOL", "1") == "1"
+TALENT_POOL_DIR = os.getenv("HIRESENSE_TALENT_POOL_DIR", os.path.join(PROJECT_ROOT, "talent_pool"))
+# Below this many vectors a brute-force scan is both exact and fast enough
+EXACT_SEARCH_LIMIT = int(os.getenv("HIRESENSE_EXACT_SEARCH_LIMIT", "20000"))
+# Inverted lists probed per query
+IVF_NPROBE = int(os.getenv("HIRESENSE_IVF_NPROBE", "8"))
+# Rebuild the IVF index once this fraction of vectors has been added since the last build
+IVF_REBUILD_GROWTH = float(os.getenv("HIRESENSE_IVF_REBUILD_GROWTH", "0.2"))
+
+_KMEANS_ITERATIONS = 10
+_KMEANS_SAMPLE_PER_LIST = 256
+_CHUNK_ROWS = 65536
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class IVFIndex:
+    """
+    Inverted-file index over unit vectors: k-means centroids plus, for each
+    centroid, the rows assigned to it (stored contiguously, split by offsets).
+    """
+
+    def __init__(self, centroids: np.ndarray, list_rows: np.ndarray, offsets: np.ndarray, size: int):
+        self.centroids = centroids
+        self.list_rows = list_rows
+        self.offsets = offsets
+        self.size = size  # Number of vectors covered by the index
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, seed: int = 42) -> "IVFIndex":
+        n = len(vectors)
+        nlist = max(1, min(1024, int(np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+
+        # Train spherical k-means on a sample, then assign every vector
+        sample_size = min(n, nlist * _KMEANS_SAMPLE_PER_LIST)
+        sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(_KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty clusters from random sample points
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            centroids = _normalize(sums).astype(np.float32)
+
+        assignment = np.concatenate([
+            np.argmax(np.asarray(vectors[start:start + _CHUNK_ROWS]) @ centroids.T, axis=1)
+            for start in range(0, n, _CHUNK_ROWS)
+        ])
+        list_rows = np.argsort(assignment, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))])
+        return cls(centroids, list_rows, offsets, n)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        nprobe = min(nprobe, len(self.centroids))
+        probed = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.list_rows[self.offsets[i]:self.offsets[i + 1]] for i in probed])
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"  # Workers may rebuild at the same time
+        np.savez(tmp_path, centroids=self.centroids, list_rows=self.list_rows,
+                 offsets=self.offsets, size=np.array(self.size))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IVFIndex"]:
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(data["centroids"], data["list_rows"], data["offsets"], int(data["size"]))
+
+
+class TalentPool:
+    """
+    Persistent store of every ingested resume: embeddings in an append-only,
+    memory-mapped float32 file, metadata in SQLite, and an IVF index for
+    approximate nearest-neighbour search across sessions.
+    """
+
+    def __init__(self, directory: str = TALENT_POOL_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.index_path = os.path.join(directory, "ivf_index.npz")
+        # _lock guards the in-memory view (vectors, index) and the read connection
+        # and is only held briefly; _write_lock serializes this process's appends
+        # and _rebuild_lock its index builds, so searches never wait on either
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._db_path = os.path.join(directory, "talent_pool.sqlite3")
+        self._connect()
+        if hasattr(os, "register_at_fork"):
+            # SQLite connections must not be shared with forked worker processes
+            os.register_at_fork(after_in_child=self._connect)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS resumes (
+                row INTEGER PRIMARY KEY,
+                content_hash TEXT NOT NULL UNIQUE,
+                filename TEXT NOT NULL,
+                content TEXT NOT NULL,
+                added_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+        dim = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        self.dim = int(dim[0]) if dim else None
+        self._vectors = None
+        self._index = None
+        self._index_mtime = None
+        self._load_index()
+        self._remap()
+
+    def _connect(self) -> None:
+        self._conn = sqlite3.connect(self._db_path, check_same_thread=False, timeout=60)
+        # Appends get their own connection: searches on _conn never see an
+        # uncommitted transaction, and WAL lets them read while it is open
+        self._write_conn = sqlite3.connect(self._db_path, check_same_thread=False, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+
+    # ----------------- Storage -----------------
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM resumes").fetchone()[0]
+
+    def _remap(self) -> None:
+        # Only rows with committed metadata are visible
+        n = len(self)
+        if n and self.dim:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+        else:
+            self._vectors = None
+
+    def _known_hashes(self, conn: sqlite3.Connection, hashes: List[str]) -> set:
+        known = set()
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            rows = conn.execute(
+                f"SELECT content_hash FROM resumes WHERE content_hash IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            known.update(row[0] for row in rows)
+        return known
+
+    def add_resumes(self, records: List[dict]) -> int:
+        """
+        Embeds and stores resumes not already in the pool (deduplicated by
+        content hash). Returns the number of resumes added.
+        Safe to call from several worker processes sharing the pool directory.
+        """
+        hashes = [content_hash(record["content"]) for record in records]
+        with self._lock:
+            known = self._known_hashes(self._conn, hashes)
+
+        new = {}
+        for record, resume_hash in zip(records, hashes):
+            if resume_hash not in known and resume_hash not in new:
+                new[resume_hash] = record
+        if not new:
+            return 0
+
+        # Embedding takes no lock: searches and other writers carry on meanwhile
+        embeddings = generate_embeddings([record["content"] for record in new.values()])
+
+        with self._write_lock:
+            conn = self._write_conn
+            # Serializes appends across processes; rows are numbered by the committed count
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another thread or process may have added some of them meanwhile
+                known = self._known_hashes(conn, list(new))
+                keep = [i for i, resume_hash in enumerate(new) if resume_hash not in known]
+                if not keep:
+                    conn.rollback()
+                    return 0
+                new = {resume_hash: record for resume_hash, record in new.items() if resume_hash not in known}
+                embeddings = embeddings[keep]
+
+                dim = conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+                dim = int(dim[0]) if dim else embeddings.shape[1]
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('dim', ?)", (str(dim),))
+
+                # Overwrite anything past the last committed row (e.g. after a crash), then append
+                first_row = conn.execute("SELECT COUNT(*) FROM resumes").fetchone()[0]
+                with open(self.vectors_path, "r+b" if os.path.exists(self.vectors_path) else "w+b") as f:
+                    f.seek(first_row * dim * 4)
+                    f.write(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes())
+                    f.truncate()
+
+                now = time.time()
+                conn.executemany(
+                    "INSERT INTO resumes VALUES (?, ?, ?, ?, ?)",
+                    [(first_row + i, resume_hash, record["filename"], record["content"], now)
+                     for i, (resume_hash, record) in enumerate(new.items())],
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        with self._lock:
+            self.dim = dim
+            self._remap()
+            stale = self._index_is_stale()
+        if stale:
+            self.rebuild_index()
+        return len(new)
+
+    # ----------------- Index -----------------
+    def _index_is_stale(self) -> bool:
+        n = len(self)
+        if n < EXACT_SEARCH_LIMIT:
+            return False
+        return self._index is None or (n - self._index.size) > IVF_REBUILD_GROWTH * self._index.size
+
+    def rebuild_index(self) -> None:
+        """
+        Rebuilds the IVF index over every stored vector and persists it.
+        k-means runs on a snapshot without holding the lock; searches keep using
+        the previous index until the new one is swapped in.
+        """
+        with self._rebuild_lock:
+            with self._lock:
+                vectors = self._vectors
+            if vectors is None:
+                with self._lock:
+                    self._index = None
+                return
+            index = IVFIndex.build(vectors)
+            index.save(self.index_path)
+            mtime = os.stat(self.index_path).st_mtime_ns
+            with self._lock:
+                # Rows appended meanwhile are covered by the search's tail scan
+                self._index = index
+                self._index_mtime = mtime
+
+    def _load_index(self) -> None:
+        self._index = IVFIndex.load(self.index_path)
+        self._index_mtime = os.stat(self.index_path).st_mtime_ns if self._index is not None else None
+
+    def _index_file_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.index_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _refresh(self) -> None:
+        """Picks up rows and index rebuilds written by other worker processes."""
+        with self._lock:
+            if self.dim is None:
+                dim = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+                self.dim = int(dim[0]) if dim else None
+            if len(self) != (len(self._vectors) if self._vectors is not None else 0):
+                self._remap()
+            mtime = self._index_file_mtime()
+            if mtime == self._index_mtime:
+                return
+        # Loaded outside the lock; a concurrent search may load it too, which is harmless
+        index = IVFIndex.load(self.index_path)
+        with self._lock:
+            self._index = index
+            self._index_mtime = mtime if index is not None else None
+
+    # ----------------- Search -----------------
+    def search(self, jd_text: str, top_k: int = 20, nprobe: int = IVF_NPROBE) -> List[dict]:
+        """
+        Returns the top_k stored resumes most similar to the JD. Small pools are
+        scanned exactly; larger ones probe the nearest IVF lists plus any rows
+        added since the index was built.
+        """
+        self._refresh()
+        with self._lock:
+            vectors, index = self._vectors, self._index
+        if vectors is None:
+            return []
+
+        query = generate_embeddings([jd_text])[0]
+        n = len(vectors)
+
+        if index is None or n < EXACT_SEARCH_LIMIT:
+            scores = np.concatenate([
+                np.asarray(vectors[start:start + _CHUNK_ROWS]) @ query for start in range(0, n, _CHUNK_ROWS)
+            ])
+            rows = np.arange(n)
+        else:
+            rows = np.concatenate([index.candidates(query, nprobe), np.arange(index.size, n)])
+            rows.sort()  # Sequential reads from the memory map
+            scores = np.asarray(vectors[rows]) @ query
+
+        k = min(top_k, len(rows))
+        if k == 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return self._describe(rows[best].tolist(), scores[best].tolist())
+
+    def _describe(self, rows: List[int], scores: List[float]) -> List[dict]:
+        placeholders = ",".join("?" * len(rows))
+        with self._lock:
+            meta = {
+                row: (filename, added_at)
+                for row, filename, added_at in self._conn.execute(
+                    f"SELECT row, filename, added_at FROM resumes WHERE row IN ({placeholders})", rows
+                )
+            }
+        return [
+            {"id": row, "filename": meta[row][0], "similarity": round(score, 4), "added_at": meta[row][1]}
+            for row, score in zip(rows, scores)
+        ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "resumes": len(self),
+                "dim": self.dim,
+                "index": "ivf" if self._index is not None and len(self) >= EXACT_SEARCH_LIMIT else "exact",
+                "indexed_resumes": self._index.size if self._index is not None else 0,
+                "ivf_lists": len(self._index.centroids) if self._index is not None else 0,
+            }
+
+
+talent_pool = TalentPool() if TALENT_POOL_ENABLED else None
+
+
+def index_resumes(records: List[dict]) -> None:
+    """Adds freshly uploaded resumes to the talent pool (run as a background task)."""
+    if talent_pool is None or not records:
+        return
+    try:
+        added = talent_pool.add_resumes(records)
+        print(f"Talent pool: added {added} new resumes ({len(talent_pool)} total).")
+    except Exception as e:
+        print(f"Failed to add resumes to the talent pool: {e}")
@@ -1,31 +1,77 @@
 # app/services/view_service.py
 
+import mimetypes
 import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Mapping, Optional
+
 from fastapi import HTTPException
-# 💡 NEW: Import StreamingResponse and a standard file library
-from fastapi.responses import StreamingResponse
-import io
+# FileResponse sends the file from disk and answers Range requests with 206
+from fastapi.responses import FileResponse, Response
+
+from app.services.textextract_service import FORMAT_MEDIA_TYPES, detect_file_format
+
+# Uploaded markup is shown as source, never rendered on the API's origin
+UNSAFE_MEDIA_TYPES = {"text/html", "application/xhtml+xml"}
+CACHE_CONTROL = "private, no-cache"  # Browsers revalidate and get a 304 if unchanged
+
+
+def _file_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _is_not_modified(request_headers: Mapping[str, str], etag: str, stat: os.stat_result) -> bool:
+    """Evaluates If-None-Match (preferred) or If-Modified-Since against the file."""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stat.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
 
-def get_resume_file(filename: str, folder: str = "./temp_resumes"):
+
+def _media_type(file_path: str, filename: str) -> str:
+    """Content type from the file's bytes, falling back to its extension."""
+    fmt = detect_file_format(file_path)
+    media_type = FORMAT_MEDIA_TYPES.get(fmt) if fmt else None
+    media_type = media_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return "text/plain" if media_type in UNSAFE_MEDIA_TYPES else media_type
+
+
+def get_resume_file(filename: str, folder: str = "./temp_resumes", request_headers: Optional[Mapping[str, str]] = None):
     """
     Retrieves a resume file from a specified folder for inline viewing.
+    Unchanged files are answered with 304 from their ETag/Last-Modified.
     """
     file_path = os.path.join(folder, filename)
-    
-    if not os.path.exists(file_path):
+
+    if os.path.basename(filename) != filename or not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail=f"File not found: {filename}")
-    
+
     try:
-        # Open the file in binary read mode
-        with open(file_path, "rb") as file_handle:
-            # 💡 NEW: Read the file content into an in-memory buffer
-            file_content = io.BytesIO(file_handle.read())
-        
-        # 💡 NEW: Return a StreamingResponse with the correct headers for inline viewing
-        return StreamingResponse(
-            file_content,
-            media_type="application/pdf",
-            headers={"Content-Disposition": "inline"}
+        stat = os.stat(file_path)
+        etag = _file_etag(stat)
+        headers = {
+            "etag": etag,
+            "last-modified": formatdate(stat.st_mtime, usegmt=True),
+            "cache-control": CACHE_CONTROL,
+            "x-content-type-options": "nosniff",
+        }
+        if request_headers and _is_not_modified(request_headers, etag, stat):
+            return Response(status_code=304, headers=headers)
+
+        return FileResponse(
+            file_path,
+            media_type=_media_type(file_path, filename),
+            filename=filename,
+            content_disposition_type="inline",
+            stat_result=stat,
+            headers=headers,
         )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to read file: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to read file: {e}")
@@ -0,0 +1,116 @@
+# app/utils/analytics_aggregates.py
+
+import math
+from bisect import bisect_left, insort
+from typing import Dict, List, Tuple
+
+MAX_SCORE = 100
+
+
+class SkillFrequencies:
+    """
+    Skill counts grouped by frequency, with the distinct frequencies kept
+    sorted, so the top N skills are read without scanning every skill.
+    """
+
+    def __init__(self):
+        self._counts: Dict[str, int] = {}
+        self._by_count: Dict[int, Dict[str, None]] = {}
+        self._frequencies: List[int] = []  # Ascending
+
+    def _move(self, skill: str, old: int, new: int) -> None:
+        if old:
+            bucket = self._by_count[old]
+            del bucket[skill]
+            if not bucket:
+                del self._by_count[old]
+                del self._frequencies[bisect_left(self._frequencies, old)]
+        if new:
+            if new not in self._by_count:
+                self._by_count[new] = {}
+                insort(self._frequencies, new)
+            self._by_count[new][skill] = None
+            self._counts[skill] = new
+        else:
+            del self._counts[skill]
+
+    def add(self, skill: str) -> None:
+        count = self._counts.get(skill, 0)
+        self._move(skill, count, count + 1)
+
+    def discard(self, skill: str) -> None:
+        count = self._counts.get(skill, 0)
+        if count:
+            self._move(skill, count, count - 1)
+
+    def most_common(self, n: int) -> List[Tuple[str, int]]:
+        top = []
+        for frequency in reversed(self._frequencies):
+            for skill in self._by_count[frequency]:
+                if len(top) == n:
+                    return top
+                top.append((skill, frequency))
+        return top
+
+
+class AnalyticsAggregates:
+    """
+    Running dashboard aggregates over a set of resume records: counts per
+    integer score, matched-skill frequencies and matched/missing totals.
+    Each record's contribution is remembered so it can be replaced or removed.
+    """
+
+    def __init__(self):
+        self.score_counts = [0] * (MAX_SCORE + 1)
+        self.skills = SkillFrequencies()
+        self.total_matched = 0
+        self.total_missing = 0
+        self.scored = 0  # Records holding a score
+        self._contributions: Dict[str, tuple] = {}
+
+    def update(self, record: dict) -> None:
+        """Adds a record, replacing its previous contribution if it was already counted."""
+        self.discard(record["filename"])
+        # Unscored resumes count as 0, like the original dashboard
+        score = max(0, min(MAX_SCORE, record.get("score", 0)))
+        bucket = math.floor(score)
+        matched = tuple(record.get("matched_skills", []))
+        missing = len(record.get("missing_skills", []))
+        has_score = "score" in record
+
+        self.score_counts[bucket] += 1
+        for skill in matched:
+            self.skills.add(skill)
+        self.total_matched += len(matched)
+        self.total_missing += missing
+        self.scored += has_score
+        self._contributions[record["filename"]] = (bucket, matched, missing, has_score)
+
+    def discard(self, filename: str) -> None:
+        contribution = self._contributions.pop(filename, None)
+        if contribution is None:
+            return
+        bucket, matched, missing, has_score = contribution
+        self.score_counts[bucket] -= 1
+        for skill in matched:
+            self.skills.discard(skill)
+        self.total_matched -= len(matched)
+        self.total_missing -= missing
+        self.scored -= has_score
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def histogram(self, bin_width: int = 20) -> List[dict]:
+        """
+        Score distribution in bins of bin_width over 0-100. A score of exactly
+        100 falls into the last bin.
+        """
+        bins = math.ceil(MAX_SCORE / bin_width)
+        counts = [0] * bins
+        for bucket, count in enumerate(self.score_counts):
+            counts[min(bucket // bin_width, bins - 1)] += count
+        return [
+            {"range": f"{i * bin_width}-{min((i + 1) * bin_width, MAX_SCORE)}%", "count": counts[i]}
+            for i in range(bins)
+        ]
@@ -0,0 +1,179 @@
+# app/utils/resume_collection.py
+
+import threading
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+from itertools import count
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.utils.analytics_aggregates import AnalyticsAggregates
+
+
+def rank_key(resume: dict):
+    """Sort key: classifier-scored resumes rank above embedding-only ones, then by score."""
+    return (resume.get("score_source") != "embedding", resume.get("score", 0))
+
+
+class ResumeCollection:
+    """
+    Resume records indexed by filename, in upload order, with O(1) lookup and
+    removal and a ranked view kept sorted incrementally with bisect.
+    Dashboard aggregates are kept up to date alongside.
+    Adding a record whose filename already exists replaces the old one.
+    Match jobs update the collection from worker threads, so every method takes
+    `lock`; callers that read several values (e.g. analytics) hold it too.
+    Filenames added, updated or removed are tracked until take_changes(), so
+    session stores can persist only what changed.
+    """
+
+    def __init__(self, records: Iterable[dict] = ()):
+        self.lock = threading.RLock()
+        self._records: Dict[str, dict] = {}
+        # Ascending (-model_scored, -score, seq, filename): best first, ties in upload order
+        self._ranked: List[tuple] = []
+        self._entries: Dict[str, tuple] = {}
+        self._seq = count()
+        self.content_bytes = 0
+        self.analytics = AnalyticsAggregates()
+        # filename -> "add", "update" or "remove"
+        self._changed: Dict[str, str] = {}
+        self._cleared = False
+        self._tracking = True
+        with self.untracked():
+            self.extend(records)
+
+    # ----------------- Collection Protocol -----------------
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[dict]:
+        # Iterates a snapshot, so concurrent changes can't break the loop
+        return iter(self.to_list())
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self._records
+
+    def get(self, filename: str) -> Optional[dict]:
+        return self._records.get(filename)
+
+    # ----------------- Mutation -----------------
+    def add(self, record: dict) -> None:
+        filename = record["filename"]
+        with self.lock:
+            if filename in self._records:
+                self.remove(filename)
+            self._records[filename] = record
+            self.content_bytes += len(record["content"])
+            entry = self._entry(record, next(self._seq))
+            self._entries[filename] = entry
+            insort(self._ranked, entry)
+            self.analytics.update(record)
+            self._track(filename, "add")
+
+    def extend(self, records: Iterable[dict]) -> None:
+        with self.lock:
+            for record in records:
+                self.add(record)
+
+    def remove(self, filename: str) -> Optional[dict]:
+        """Removes and returns the record, or None if it is not in the collection."""
+        with self.lock:
+            record = self._records.pop(filename, None)
+            if record is None:
+                return None
+            self.content_bytes -= len(record["content"])
+            self._discard_entry(self._entries.pop(filename))
+            self.analytics.discard(filename)
+            self._track(filename, "remove")
+            return record
+
+    def clear(self) -> None:
+        with self.lock:
+            self._records.clear()
+            self._ranked.clear()
+            self._entries.clear()
+            self.content_bytes = 0
+            self.analytics.clear()
+            if self._tracking:
+                self._changed.clear()
+                self._cleared = True
+
+    def reposition(self, filename: str) -> None:
+        """
+        Moves a record within the ranked view and refreshes its analytics
+        after its score or skills were updated in place. Does nothing if the
+        record has been removed meanwhile.
+        """
+        with self.lock:
+            record = self._records.get(filename)
+            if record is None:
+                return
+            self.analytics.update(record)
+            self._track(filename, "update")
+            old = self._entries[filename]
+            new = self._entry(record, old[2])
+            if new != old:
+                self._discard_entry(old)
+                self._entries[filename] = new
+                insort(self._ranked, new)
+
+    # ----------------- Change Tracking -----------------
+    def _track(self, filename: str, kind: str) -> None:
+        if not self._tracking:
+            return
+        if kind == "update" and filename in self._changed:
+            return  # An unsaved add stays an add
+        self._changed[filename] = kind
+
+    @contextmanager
+    def untracked(self) -> Iterator[None]:
+        """Applies changes that are already persisted (e.g. loaded from the store) without tracking them."""
+        with self.lock:
+            self._tracking = False
+            try:
+                yield
+            finally:
+                self._tracking = True
+
+    def take_changes(self) -> Tuple[bool, Dict[str, str]]:
+        """Returns (cleared, {filename: change kind}) since the last call and resets them."""
+        with self.lock:
+            changes = self._cleared, self._changed
+            self._cleared, self._changed = False, {}
+            return changes
+
+    def restore_changes(self, cleared: bool, changed: Dict[str, str]) -> None:
+        """Puts back changes taken by a save that failed; newer changes take precedence."""
+        with self.lock:
+            self._cleared = self._cleared or cleared
+            self._changed = {**changed, **self._changed}
+
+    def has_changes(self) -> bool:
+        return self._cleared or bool(self._changed)
+
+    def pending_change(self, filename: str) -> Optional[str]:
+        """The unsaved change of a record ("add", "update", "remove"), if any."""
+        return self._changed.get(filename)
+
+    def upload_order(self, filename: str) -> int:
+        """Position of the record in upload order (-1 if not in the collection)."""
+        entry = self._entries.get(filename)
+        return entry[2] if entry else -1
+
+    def _entry(self, record: dict, seq: int) -> tuple:
+        model_scored, score = rank_key(record)
+        return (-int(model_scored), -score, seq, record["filename"])
+
+    def _discard_entry(self, entry: tuple) -> None:
+        del self._ranked[bisect_left(self._ranked, entry)]
+
+    # ----------------- Views -----------------
+    def ranked(self, limit: Optional[int] = None) -> List[dict]:
+        """Records ordered best-first by rank_key, optionally only the top `limit`."""
+        with self.lock:
+            entries = self._ranked[:limit] if limit else self._ranked
+            return [self._records[entry[3]] for entry in entries]
+
+    def to_list(self) -> List[dict]:
+        with self.lock:
+            return list(self._records.values())
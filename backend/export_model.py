@@ -0,0 +1,39 @@
+# export_model.py
+# Exports the fine-tuned classifier to ONNX and checks backend parity.
+#
+#   python export_model.py export [--no-quantize]
+#   python export_model.py parity --backend onnx-int8 [--limit 500]
+
+import argparse
+import json
+
+from app.services.inference_backend_service import BACKENDS, MODEL_PATH, export_onnx, parity_check
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HireSense model export and backend parity tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export the checkpoint to ONNX")
+    export_parser.add_argument("--model-path", default=MODEL_PATH)
+    export_parser.add_argument("--no-quantize", action="store_true", help="Skip the INT8 ONNX copy")
+    export_parser.add_argument("--opset", type=int, default=17)
+
+    parity_parser = subparsers.add_parser("parity", help="Compare a backend against the fp32 torch model")
+    parity_parser.add_argument("--backend", choices=BACKENDS, required=True)
+    parity_parser.add_argument("--model-path", default=MODEL_PATH)
+    parity_parser.add_argument("--limit", type=int, default=None, help="Only check the first N rows")
+    parity_parser.add_argument("--batch-size", type=int, default=16)
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        for path in export_onnx(args.model_path, quantize=not args.no_quantize, opset=args.opset):
+            print(f"Wrote {path}")
+    else:
+        report = parity_check(args.backend, args.model_path, limit=args.limit, batch_size=args.batch_size)
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
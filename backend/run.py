@@ -1,4 +1,147 @@
+import argparse
+import gc
+import glob
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+from typing import Optional
+
 import uvicorn
 
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the HireSense API.")
+    parser.add_argument("--host", default=os.getenv("HIRESENSE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("HIRESENSE_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("HIRESENSE_WORKERS", "1")),
+                        help="Worker processes; more than 1 preloads the models once and forks the workers")
+    return parser.parse_args()
+
+
+# ----------------- Multi-worker serving -----------------
+def _configure_workers() -> Optional[str]:
+    """
+    Environment every worker must agree on; set before the app is imported.
+    Returns the metrics directory if it was created here (removed on exit).
+    """
+    store = os.environ.setdefault("HIRESENSE_SESSION_STORE", "sqlite")
+    if store != "sqlite":
+        sys.exit("Multiple workers need shared sessions: set HIRESENSE_SESSION_STORE=sqlite.")
+    # /metrics sums the snapshots the workers write here; a given directory
+    # is kept, minus the snapshots of an earlier run
+    metrics_dir = os.getenv("HIRESENSE_METRICS_DIR")
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, "metrics-*.json")):
+            os.remove(path)
+        metrics_dir = None
+    else:
+        metrics_dir = os.environ["HIRESENSE_METRICS_DIR"] = tempfile.mkdtemp(prefix="hiresense-metrics-")
+    # Tokenizer thread pools do not survive fork
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    return metrics_dir
+
+
+def _serve_worker(app, sock: socket.socket, host: str, port: int, workers: int) -> None:
+    # Split the cores between workers instead of each one using all of them
+    threads = int(os.getenv("HIRESENSE_TORCH_THREADS", "0")) or max(1, (os.cpu_count() or 1) // workers)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    config = uvicorn.Config(app, host=host, port=port)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(app, sock: socket.socket, args) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            _serve_worker(app, sock, args.host, args.port, args.workers)
+        except BaseException as e:
+            print(f"Worker {os.getpid()} exited with error: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    print(f"Started worker {pid}.")
+    return pid
+
+
+def run_workers(args) -> None:
+    """
+    Loads the models in this process, then forks the workers so the weights
+    are shared copy-on-write. Workers share one listening socket and keep
+    sessions in SQLite. Crashed workers are replaced.
+    """
+    if not hasattr(os, "fork"):
+        sys.exit("--workers > 1 needs os.fork (not available on Windows); use a single worker.")
+    metrics_dir = _configure_workers()
+
+    from app.main import app
+    from app.services.inference_backend_service import INFERENCE_BACKEND
+    from app.services.model_loader_service import load_all
+
+    # ONNX Runtime sessions and their thread pools are not fork-safe: with an
+    # onnx backend each worker loads its own classifier after the fork (warmed
+    # on startup, or on first use). Models loaded here are skipped by the warm-up.
+    fork_unsafe = ("classifier",) if INFERENCE_BACKEND.startswith("onnx") else ()
+    load_all(exclude=fork_unsafe)
+    # Keep the loaded objects out of later collections, whose refcount and
+    # GC-header writes would otherwise copy their pages into each worker
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET6 if ":" in args.host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers.")
+
+    workers = set()
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(args.workers):
+        workers.add(_spawn(app, sock, args))
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited ({os.waitstatus_to_exitcode(status)}); restarting it.")
+            workers.add(_spawn(app, sock, args))
+    sock.close()
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="127.0.0.1", port=8000,reload=True)
\ No newline at end of file
+    args = parse_args()
+    if args.workers > 1:
+        run_workers(args)
+    else:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, reload=True)